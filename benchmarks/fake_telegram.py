@@ -0,0 +1,138 @@
+import asyncio
+import itertools
+import os
+import time
+from types import SimpleNamespace
+
+CHUNK_SIZE = 512 * 1024
+
+_message_ids = itertools.count(1)
+
+
+class FakeMessage:
+    """Just enough of a pyrogram Message for the rename pipeline"""
+
+    def __init__(self, chat_id, text="", source=None, file_name=None, unique_id=None):
+        self.id = next(_message_ids)
+        self.chat = SimpleNamespace(id=chat_id)
+        self.from_user = SimpleNamespace(id=chat_id)
+        self.text = text
+        self.source = source
+        self.video = None
+        self.audio = None
+        self.document = None
+        self.empty = False
+        if source:
+            self.document = SimpleNamespace(
+                file_id=f"file-{self.id}",
+                file_unique_id=unique_id or f"unique-{self.id}",
+                file_name=file_name or os.path.basename(source),
+                file_size=os.path.getsize(source),
+            )
+
+    async def reply_text(self, text, **kwargs):
+        return FakeMessage(self.chat.id, text)
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        return self
+
+    async def delete(self):
+        return True
+
+
+class FakeClient:
+    """Stand-in for the bot client that moves real bytes at a simulated bandwidth.
+
+    ``download_media`` copies the message's source file and the ``send_*``
+    methods read the output, both in chunks paced to ``download_rate`` /
+    ``upload_rate`` bytes per second per transfer, after ``latency``
+    seconds for the request itself. Progress callbacks are called the way
+    pyrogram calls them.
+    """
+
+    def __init__(self, download_rate, upload_rate, latency=0.1):
+        self.download_rate = download_rate
+        self.upload_rate = upload_rate
+        self.latency = latency
+        self.sent = []
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self.bytes_uploaded = 0
+
+    async def _pace(self, started, done, rate):
+        ahead = started + done / rate - time.monotonic()
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+    async def download_media(self, message, file_name=None, progress=None, progress_args=(), **kwargs):
+        if isinstance(message, str):
+            # Thumbnails by file_id - the benchmark users have none
+            return None
+        await asyncio.sleep(self.latency)
+        total = message.document.file_size
+        started = time.monotonic()
+        done = 0
+        with open(message.source, "rb") as src, open(file_name, "wb") as dst:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                done += len(chunk)
+                self.bytes_downloaded += len(chunk)
+                self.bytes_saved += len(chunk)
+                await self._pace(started, done, self.download_rate)
+                if progress:
+                    await progress(done, total, *progress_args)
+        return file_name
+
+    async def stream_media(self, message, limit=0, offset=0):
+        await asyncio.sleep(self.latency)
+        started = time.monotonic()
+        done = 0
+        with open(message.source, "rb") as src:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                done += len(chunk)
+                self.bytes_downloaded += len(chunk)
+                await self._pace(started, done, self.download_rate)
+                yield chunk
+
+    async def _upload(self, chat_id, path, progress=None, progress_args=(), **kwargs):
+        await asyncio.sleep(self.latency)
+        total = os.path.getsize(path)
+        started = time.monotonic()
+        done = 0
+        with open(path, "rb") as src:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                done += len(chunk)
+                self.bytes_uploaded += len(chunk)
+                await self._pace(started, done, self.upload_rate)
+                if progress:
+                    await progress(done, total, *progress_args)
+        self.sent.append((chat_id, kwargs.get("file_name"), total))
+        media = SimpleNamespace(file_id=f"sent-{len(self.sent)}")
+        return SimpleNamespace(document=media, video=None, audio=None)
+
+    async def send_document(self, chat_id, document, **kwargs):
+        return await self._upload(chat_id, document, **kwargs)
+
+    async def send_video(self, chat_id, video, **kwargs):
+        return await self._upload(chat_id, video, **kwargs)
+
+    async def send_audio(self, chat_id, audio, **kwargs):
+        return await self._upload(chat_id, audio, **kwargs)
+
+    async def send_cached_media(self, chat_id, file_id, **kwargs):
+        await asyncio.sleep(self.latency)
+        self.sent.append((chat_id, kwargs.get("file_name"), 0))
+        return SimpleNamespace(document=SimpleNamespace(file_id=file_id), video=None, audio=None)
+
+    async def get_messages(self, chat_id, message_ids):
+        return None
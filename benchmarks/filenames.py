@@ -0,0 +1,82 @@
+"""Accuracy and speed of the file name metadata extractors on a golden corpus.
+
+Every corpus entry is a real-world style release name with the episode,
+season and quality the rename template should get. Seasons are compared
+as numbers since the template zero-pads them.
+
+    python -m benchmarks.filenames [--verbose] [--number 2000]
+"""
+import argparse
+import json
+import os
+import timeit
+
+from helper.filename import extract_metadata, extract_metadata_regex
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "filename_corpus.json")
+
+EXTRACTORS = {
+    "regex chain": extract_metadata_regex,
+    "tokenizer": extract_metadata,
+}
+
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def mismatches(result, expected):
+    episode, season, quality = result
+    wrong = []
+    if episode != expected["episode"]:
+        wrong.append("episode")
+    if int(season) != int(expected["season"]):
+        wrong.append("season")
+    if quality != expected["quality"]:
+        wrong.append("quality")
+    return wrong
+
+
+def score(extract, corpus, verbose=False):
+    """Correct names and fields, printing every mismatch when verbose"""
+    names = fields = 0
+    for entry in corpus:
+        result = extract(entry["name"])
+        wrong = mismatches(result, entry)
+        fields += 3 - len(wrong)
+        names += not wrong
+        if wrong and verbose:
+            expected = (entry["episode"], entry["season"], entry["quality"])
+            print(f"  {entry['name']}\n    got {result}, expected {expected}")
+    return names, fields
+
+
+def time_per_call(extract, corpus, number):
+    names = [entry["name"] for entry in corpus]
+    runs = timeit.repeat(lambda: [extract(name) for name in names], number=number, repeat=7)
+    return min(runs) / (number * len(names))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--number", type=int, default=500, help="passes over the corpus per timing run")
+    parser.add_argument("--verbose", action="store_true", help="list every wrong extraction")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    print(f"{len(corpus)} names\n")
+    print(f"{'extractor':<12} {'names ok':>10} {'fields ok':>10} {'us/call':>9}")
+    for label, extract in EXTRACTORS.items():
+        if args.verbose:
+            print(f"{label}:")
+        names, fields = score(extract, corpus, args.verbose)
+        per_call = time_per_call(extract, corpus, args.number)
+        print(
+            f"{label:<12} {names:>5}/{len(corpus):<4} {fields:>5}/{len(corpus) * 3:<4} {per_call * 1e6:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Offline end-to-end benchmark of the download -> process -> upload pipeline.
+
+Synthetic inputs are made with ffmpeg's lavfi testsrc and sent through the
+real ``auto_rename_files`` / ``start_processing`` code against a fake
+client that simulates Telegram bandwidth, with the in-memory database
+backend. Each concurrency level runs in its own process so CPU, peak RSS
+and disk writes are measured separately.
+
+    python -m benchmarks.pipeline --concurrency 1 2 4 --repeat 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RESOLUTIONS = {"480p": (854, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
+CONTAINERS = ("mkv", "mp4")
+SUBTITLE_CODECS = {"mkv": "srt", "mp4": "mov_text"}
+STAGES = ("download", "process", "upload")
+FORMAT_TEMPLATE = "[Bench] Test Source S{season}E{episode} [{quality}]"
+USERS = 4
+
+
+def write_subtitles(path, duration):
+    with open(path, "w") as f:
+        for n in range(int(duration)):
+            f.write(f"{n + 1}\n00:00:{n:02d},000 --> 00:00:{n:02d},900\nLine {n + 1}\n\n")
+
+
+def generate_inputs(directory, duration, resolutions, containers, subtitles):
+    """Make (or reuse) one testsrc clip per resolution / container / subtitle combination"""
+    os.makedirs(directory, exist_ok=True)
+    srt = os.path.join(directory, f"subs_{duration}s.srt")
+    if not os.path.exists(srt):
+        write_subtitles(srt, min(duration, 59))
+
+    inputs = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for container in containers:
+            for subs in subtitles:
+                name = f"testsrc_{resolution}_{duration}s{'_subs' if subs else ''}.{container}"
+                path = os.path.join(directory, name)
+                if not os.path.exists(path):
+                    cmd = [
+                        "ffmpeg", "-hide_banner", "-loglevel", "error",
+                        "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate=24:duration={duration}",
+                        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+                    ]
+                    if subs:
+                        cmd += ["-i", srt]
+                    cmd += ["-map", "0:v", "-map", "1:a"]
+                    if subs:
+                        cmd += ["-map", "2:s", "-c:s", SUBTITLE_CODECS[container]]
+                    cmd += ["-c:v", "libx264", "-preset", "veryfast", "-c:a", "aac", "-y", path]
+                    subprocess.run(cmd, check=True)
+                inputs.append({
+                    "path": path, "resolution": resolution, "container": container, "subs": subs,
+                })
+    return inputs
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+async def run_level(config):
+    """Child process: push every input through the pipeline and measure it"""
+    import plugins.file_rename as file_rename
+    from helper.database import ZoroBhaiya
+    from benchmarks.fake_telegram import FakeClient, FakeMessage
+
+    stage_times = {stage: [] for stage in STAGES}
+    latencies = []
+    outputs = []
+
+    def timed(name, handler):
+        async def run(job):
+            start = time.monotonic()
+            try:
+                next_stage = await handler(job)
+            finally:
+                stage_times[name].append(time.monotonic() - start)
+            if name == "process" and next_stage == "upload" and job.output_path != job.download_path:
+                outputs.append(job.final_file_size)
+            return next_stage
+        return run
+
+    for name in STAGES:
+        stage = file_rename.PIPELINE.stages[name]
+        stage.handler = timed(name, stage.handler)
+
+    run_job = file_rename.JOB_QUEUE.handler
+
+    async def timed_job(job):
+        try:
+            await run_job(job)
+        finally:
+            latencies.append(time.time() - job.enqueued_at)
+
+    file_rename.JOB_QUEUE.handler = timed_job
+
+    for user_id in range(1, USERS + 1):
+        await ZoroBhaiya.set_format_template(user_id, FORMAT_TEMPLATE)
+
+    client = FakeClient(config["download_rate"], config["upload_rate"], config["latency"])
+    self_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    started = time.monotonic()
+
+    submitted = 0
+    for _ in range(config["repeat"]):
+        for item in config["inputs"]:
+            submitted += 1
+            message = FakeMessage(
+                submitted % USERS + 1,
+                source=item["path"],
+                file_name=f"[Bench] Test Source - {submitted:02d} [{item['resolution']}].{item['container']}",
+            )
+            await file_rename.auto_rename_files(client, message)
+
+    while file_rename.active_jobs or len(file_rename.JOB_QUEUE):
+        await asyncio.sleep(0.05)
+
+    wall = time.monotonic() - started
+    self_after = resource.getrusage(resource.RUSAGE_SELF)
+    children_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    def cpu(before, after):
+        return (after.ru_utime - before.ru_utime) + (after.ru_stime - before.ru_stime)
+
+    blocks = (
+        (self_after.ru_oublock - self_before.ru_oublock)
+        + (children_after.ru_oublock - children_before.ru_oublock)
+    )
+    return {
+        "concurrency": config["concurrency"],
+        "jobs": submitted,
+        "uploaded": len(client.sent),
+        "wall": wall,
+        "jobs_per_hour": len(client.sent) / wall * 3600 if wall else 0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "stages": {
+            name: {
+                "count": len(times),
+                "mean": statistics.mean(times) if times else 0.0,
+                "p95": percentile(times, 0.95),
+                "total": sum(times),
+            }
+            for name, times in stage_times.items()
+        },
+        "cpu_bot": cpu(self_before, self_after),
+        "cpu_ffmpeg": cpu(children_before, children_after),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_bot": self_after.ru_maxrss * 1024,
+        "peak_rss_ffmpeg": children_after.ru_maxrss * 1024,
+        # Downloaded sources plus ffmpeg outputs; segment files of a split encode are not counted
+        "disk_written": client.bytes_saved + sum(outputs),
+        # What reached the block device - files deleted before writeback never get here
+        "device_written": blocks * 512,
+        "bytes_downloaded": client.bytes_downloaded,
+        "bytes_uploaded": client.bytes_uploaded,
+    }
+
+
+def child_main(config_json, result_path):
+    config = json.loads(config_json)
+    result = asyncio.run(run_level(config))
+    with open(result_path, "w") as f:
+        json.dump(result, f)
+
+
+def spawn_level(config, env_overrides):
+    """Run one concurrency level in a fresh interpreter configured through env vars"""
+    env = dict(os.environ)
+    env.update(env_overrides)
+    with tempfile.NamedTemporaryFile("r", suffix=".json") as result:
+        subprocess.run(
+            [sys.executable, "-m", "benchmarks.pipeline", "--child", json.dumps(config), result.name],
+            cwd=ROOT, env=env, check=True, stdout=subprocess.DEVNULL,
+        )
+        return json.load(result)
+
+
+def level_env(concurrency):
+    return {
+        "DB_BACKEND": "memory",
+        "MAX_CONCURRENT_JOBS": str(concurrency),
+        "DOWNLOAD_WORKERS": str(concurrency),
+        "TRANSCODE_WORKERS": str(concurrency),
+        "UPLOAD_WORKERS": str(concurrency),
+        "MAX_JOBS_PER_USER": "0",
+        "MAX_QUEUE_SIZE": "0",
+        # Every submission must really run, not be answered from the cache
+        "OUTPUT_CACHE": "False",
+    }
+
+
+def mb(value):
+    return value / (1024 * 1024)
+
+
+def print_report(results):
+    header = (
+        f"{'conc':>4} {'jobs':>5} {'wall s':>8} {'jobs/h':>8} {'p50 s':>7} {'p95 s':>7} "
+        f"{'dl s':>6} {'proc s':>7} {'up s':>6} {'cpu bot':>8} {'cpu ff':>8} "
+        f"{'rss bot':>8} {'rss ff':>8} {'disk MB':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        stages = r["stages"]
+        print(
+            f"{r['concurrency']:>4} {r['uploaded']:>2}/{r['jobs']:<2} {r['wall']:>8.1f} {r['jobs_per_hour']:>8.0f} "
+            f"{r['latency_p50']:>7.1f} {r['latency_p95']:>7.1f} "
+            f"{stages['download']['mean']:>6.2f} {stages['process']['mean']:>7.2f} {stages['upload']['mean']:>6.2f} "
+            f"{r['cpu_bot']:>8.1f} {r['cpu_ffmpeg']:>8.1f} "
+            f"{mb(r['peak_rss_bot']):>8.0f} {mb(r['peak_rss_ffmpeg']):>8.0f} {mb(r['disk_written']):>8.1f}"
+        )
+    print(
+        "\nStage columns are mean wall seconds per job (p95 in --json output). "
+        "ffmpeg CPU and RSS cover every encode / remux / probe process; RSS is the largest single process."
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4],
+                        help="levels to run; each sets MAX_CONCURRENT_JOBS and the stage worker counts")
+    parser.add_argument("--resolutions", nargs="+", choices=list(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--containers", nargs="+", choices=CONTAINERS, default=list(CONTAINERS))
+    parser.add_argument("--subtitles", choices=("both", "with", "without"), default="both")
+    parser.add_argument("--duration", type=int, default=10, help="seconds per clip")
+    parser.add_argument("--repeat", type=int, default=1, help="times every clip is sent per level")
+    parser.add_argument("--download-mbps", type=float, default=20.0, help="simulated MB/s per download")
+    parser.add_argument("--upload-mbps", type=float, default=10.0, help="simulated MB/s per upload")
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per simulated Telegram request")
+    parser.add_argument("--inputs", default=os.path.join(tempfile.gettempdir(), "rename-bench-inputs"),
+                        help="directory the generated clips are cached in")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child_main(*args.child)
+
+    subtitles = {"both": (False, True), "with": (True,), "without": (False,)}[args.subtitles]
+    inputs = generate_inputs(args.inputs, args.duration, args.resolutions, args.containers, subtitles)
+    print(f"{len(inputs)} clips x {args.repeat} per level, {args.duration}s each, in {args.inputs}\n")
+
+    results = []
+    for concurrency in args.concurrency:
+        config = {
+            "concurrency": concurrency,
+            "inputs": inputs,
+            "repeat": args.repeat,
+            "download_rate": args.download_mbps * 1024 * 1024,
+            "upload_rate": args.upload_mbps * 1024 * 1024,
+            "latency": args.latency,
+        }
+        results.append(spawn_level(config, level_env(concurrency)))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
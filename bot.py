@@ -59,6 +59,19 @@ class Bot(Client):
         
         logger.info(f"✅ Bot Started Successfully: @{me.username}")
 
+        # Resume files that were in progress before the last restart
+        try:
+            from plugins.file_rename import resume_jobs
+            await resume_jobs(self)
+        except Exception as e:
+            logger.error(f"Job resume error: {e}")
+
+        try:
+            from plugins.admin_panel import resume_broadcasts
+            await resume_broadcasts(self)
+        except Exception as e:
+            logger.error(f"Broadcast resume error: {e}")
+
         if Config.LOG_CHANNEL:
             try:
                 curr = datetime.now(timezone("Asia/Kolkata"))
@@ -10,6 +10,8 @@ class Config(object):
     # database config
     DB_NAME = os.environ.get("DB_NAME","AutoRename")     
     DB_URL  = os.environ.get("DB_URL","")
+    DB_BACKEND = os.environ.get("DB_BACKEND", "mongo").lower()  # mongo / sqlite / memory
+    DB_PATH    = os.environ.get("DB_PATH", "bot.sqlite3")  # file for the sqlite backend
  
     # other configs
     BOT_UPTIME  = time.time()
@@ -22,6 +24,52 @@ class Config(object):
     # web response configuration     
     WEBHOOK = bool(os.environ.get("WEBHOOK", "False"))
 
+    # processing queue configuration
+    MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", "8"))  # files inside the pipeline
+    MAX_QUEUE_SIZE      = int(os.environ.get("MAX_QUEUE_SIZE", "100"))
+    QUEUE_FULL_POLICY   = os.environ.get("QUEUE_FULL_POLICY", "reject").lower()  # reject / drop_oldest
+    MAX_JOBS_PER_USER   = int(os.environ.get("MAX_JOBS_PER_USER", "2"))  # 0 = no per-user cap
+
+    # pipeline stage workers
+    DOWNLOAD_WORKERS  = int(os.environ.get("DOWNLOAD_WORKERS", "4"))
+    TRANSCODE_WORKERS = int(os.environ.get("TRANSCODE_WORKERS", str(os.cpu_count() or 1)))
+    UPLOAD_WORKERS    = int(os.environ.get("UPLOAD_WORKERS", "4"))
+    PREFETCH_JOBS     = int(os.environ.get("PREFETCH_JOBS", "2"))  # downloaded files waiting for an encoder
+
+    # transcode governor: CPU thread budget for ffmpeg encodes
+    TRANSCODE_MAX_JOBS = int(os.environ.get("TRANSCODE_MAX_JOBS", "0"))  # 0 = sized from free cores
+    FFMPEG_THREADS     = int(os.environ.get("FFMPEG_THREADS", "0"))  # 0 = fair share of free cores
+    FFMPEG_TIMEOUT     = int(os.environ.get("FFMPEG_TIMEOUT", "0"))  # seconds per ffmpeg run, 0 = no limit
+    PROBE_TIMEOUT      = int(os.environ.get("PROBE_TIMEOUT", "60"))  # seconds per ffprobe run, 0 = no limit
+
+    # load-adaptive encode profiles: faster presets as the backlog grows
+    ENCODE_BUSY_QUEUE = int(os.environ.get("ENCODE_BUSY_QUEUE", "4"))   # backlog for superfast
+    ENCODE_RUSH_QUEUE = int(os.environ.get("ENCODE_RUSH_QUEUE", "10"))  # backlog for ultrafast
+    ENCODE_TUNE       = os.environ.get("ENCODE_TUNE", "")  # e.g. animation
+
+    # pipe the download straight into ffmpeg for containers that do not need seeking
+    STREAMING_INGEST = os.environ.get("STREAMING_INGEST", "False").lower() == "true"
+
+    # segment-parallel encoding: split long videos at keyframes and encode the pieces in parallel
+    SEGMENT_ENCODING     = os.environ.get("SEGMENT_ENCODING", "False").lower() == "true"
+    SEGMENT_WORKERS      = int(os.environ.get("SEGMENT_WORKERS", str(os.cpu_count() or 1)))  # capped by the thread budget
+    SEGMENT_MIN_DURATION = int(os.environ.get("SEGMENT_MIN_DURATION", "600"))  # seconds
+
+    # re-send identical outputs by file_id instead of processing again
+    OUTPUT_CACHE = os.environ.get("OUTPUT_CACHE", "True").lower() == "true"
+
+    # per-user settings cache (format, caption, thumbnail, media type)
+    SETTINGS_CACHE_TTL  = int(os.environ.get("SETTINGS_CACHE_TTL", "300"))  # seconds, 0 = no cache
+    SETTINGS_CACHE_SIZE = int(os.environ.get("SETTINGS_CACHE_SIZE", "10000"))  # users
+
+    # broadcast: parallel sends at a global rate near Telegram's bulk limit
+    BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", "10"))
+    BROADCAST_RATE    = float(os.environ.get("BROADCAST_RATE", "25"))  # messages per second
+
+    # status message edits: coalesced per message and rate limited below Telegram's flood limits
+    EDIT_RATE      = float(os.environ.get("EDIT_RATE", "20"))      # edits per second for the whole bot
+    EDIT_RATE_CHAT = float(os.environ.get("EDIT_RATE_CHAT", "0.5"))  # edits per second per chat
+
 
 class Txt(object):
     # part of text configuration
@@ -36,7 +84,7 @@ class Txt(object):
 • Embed custom metadata
 • Support files up to 4GB
 
-**📊 Processing Capacity:** 3 files simultaneously
+**📊 Processing Capacity:** Several files simultaneously
 **📦 Max File Size:** 4GB
 
 **Click Help button below to get started! 👇**
@@ -49,6 +97,11 @@ class Txt(object):
 ✅ `{{episode}}` - Episode Number
 ✅ `{{quality}}` - Video Resolution
 ✅ `{{season}}` - Season Number
+✅ `{{resolution}}` - Video Size (1920x1080)
+✅ `{{codec}}` - Video Codec (H264, HEVC)
+✅ `{{audio}}` - Audio Languages (JPN+ENG)
+✅ `{{duration}}` - Duration
+✅ `{{size}}` - File Size
 
 **📝 Example:**
 `/autorename Naruto Shippuden S{{season}}E{{episode}} [{{quality}}] [Dual]`
@@ -68,7 +121,7 @@ class Txt(object):
   ✅ Auto Rename with Templates
   ✅ Video Watermarking (ANIME ATLAS)
   ✅ Custom Metadata Management
-  ✅ Queue System (3 concurrent)
+  ✅ Queue System (parallel processing)
   ✅ Real-time Progress Tracking
   ✅ Support up to 4GB Files
     
@@ -100,6 +153,8 @@ Simply send me a photo and I'll save it as your thumbnail!
 • `{{filename}}` - File name
 • `{{filesize}}` - File size
 • `{{duration}}` - Video duration
+• `{{episode}}`, `{{season}}`, `{{quality}}` - From the file name
+• `{{resolution}}`, `{{codec}}`, `{{audio}}` - Video size, codec and audio languages
 
 **📝 Example:**
 `/set_caption 📕 Name: {{filename}}
@@ -141,13 +196,14 @@ Use: `/autorename [format]`
 ✅ Auto rename with custom templates
 ✅ Add watermark to videos
 ✅ Set custom metadata
-✅ Queue system (max 3 concurrent)
+✅ Queue system (parallel processing)
 ✅ Real-time progress tracking
 ✅ Support files up to 4GB
 
 **📋 All Commands:**
 • `/autorename` - Set rename format
 • `/setmedia` - Set output type
+• `/cancel` - Cancel your files in progress
 • `/set_caption` - Set custom caption
 • `/viewthumb` - View thumbnail
 • `/tutorial` - Detailed guide
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
+from helper.edits import TokenBucket
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+MAX_ATTEMPTS = 3          # FloodWait retries per user
+DELETE_BATCH = 100        # dead users removed per bulk delete
+CHECKPOINT_INTERVAL = 10  # seconds between progress saves
+
+
+class Broadcast:
+    """Copy one message to every user with a worker pool at a global rate.
+
+    Workers share one token bucket, and a FloodWait pauses all of them for
+    the requested time before the user is retried. Users are sent in _id
+    order, and the highest _id below which every user is finished is saved
+    with the counters, so a restarted broadcast continues from there.
+    Counters only include users up to that _id, so the users after it that
+    are sent again on resume are not counted twice. Users that blocked the
+    bot or were deleted are removed in batches.
+    """
+
+    def __init__(self, client, db, state, workers, rate, on_progress=None):
+        self.client = client
+        self.db = db
+        self.state = state
+        self.workers = max(1, workers)
+        self.bucket = TokenBucket(rate, rate)
+        self.on_progress = on_progress
+        self.paused_until = 0
+        self.dead = []
+        self._sent_order = deque()
+        self._finished = {}
+        self._last_save = time.monotonic()
+
+    @property
+    def id(self):
+        return self.state["_id"]
+
+    async def run(self):
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        tasks = [asyncio.create_task(self._worker(queue)) for _ in range(self.workers)]
+        completed = False
+        try:
+            users = await self.db.get_user_ids(after=self.state.get("last_id"))
+            async for user in users:
+                self._sent_order.append(user["_id"])
+                await queue.put(user["_id"])
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+            completed = True
+        finally:
+            # Cancelled, or the user cursor / database failed - stop the workers and save the resume point
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self._flush_dead()
+            if not completed:
+                await self._checkpoint()
+
+        self.state["finished_at"] = time.time()
+        await self.db.delete_broadcast(self.id)
+        return self.state
+
+    async def _worker(self, queue):
+        while True:
+            user_id = await queue.get()
+            if user_id is None:
+                return
+            status = await self._send(user_id)
+            await self._finish(user_id, status)
+
+    async def _wait_turn(self):
+        while True:
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+            delay = self.bucket.delay()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            self.bucket.take()
+            return
+
+    async def _send(self, user_id):
+        for _ in range(MAX_ATTEMPTS):
+            await self._wait_turn()
+            try:
+                await self.client.copy_message(
+                    chat_id=int(user_id),
+                    from_chat_id=self.state["chat_id"],
+                    message_id=self.state["message_id"],
+                )
+                return "success"
+            except FloodWait as e:
+                self.paused_until = max(self.paused_until, time.monotonic() + e.value)
+            except (InputUserDeactivated, UserIsBlocked, PeerIdInvalid):
+                return "dead"
+            except Exception as e:
+                logger.error(f"Broadcast to {user_id} failed: {e}")
+                return "failed"
+        return "failed"
+
+    async def _finish(self, user_id, status):
+        state = self.state
+        # Resume point: every user up to last_id is finished and counted
+        self._finished[user_id] = status
+        while self._sent_order and self._sent_order[0] in self._finished:
+            done_id = self._sent_order.popleft()
+            status = self._finished.pop(done_id)
+            state["done"] += 1
+            if status == "success":
+                state["success"] += 1
+            else:
+                state["failed"] += 1
+            if status == "dead":
+                self.dead.append(done_id)
+            state["last_id"] = done_id
+
+        if len(self.dead) >= DELETE_BATCH:
+            await self._flush_dead()
+        if time.monotonic() - self._last_save >= CHECKPOINT_INTERVAL:
+            await self._checkpoint()
+
+    async def _flush_dead(self):
+        dead, self.dead = self.dead, []
+        if not dead:
+            return
+        try:
+            await self.db.delete_users(dead)
+            self.state["removed"] = self.state.get("removed", 0) + len(dead)
+        except Exception as e:
+            logger.error(f"Broadcast user cleanup failed: {e}")
+
+    async def _checkpoint(self):
+        self._last_save = time.monotonic()
+        try:
+            await self.db.save_broadcast(self.id, self.state)
+        except Exception as e:
+            logger.error(f"Broadcast checkpoint failed: {e}")
+        if self.on_progress:
+            try:
+                await self.on_progress(self)
+            except Exception:
+                pass
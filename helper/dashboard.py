@@ -0,0 +1,158 @@
+import asyncio
+import re
+from collections import OrderedDict
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from helper.edits import EDIT_SCHEDULER
+from helper.utils import forget_progress
+
+MAX_SHOWN = 20  # jobs listed on one dashboard, the rest are counted
+BUTTONS_PER_ROW = 4
+
+PERCENT_PATTERN = re.compile(r'(\d+(?:\.\d+)?)%')
+ETA_PATTERN = re.compile(r'ETA:\*\*\s*(\S+)')
+POSITION_PATTERN = re.compile(r'Position:\*\*\s*`?#(\d+)')
+
+# user_id -> their open Dashboard
+DASHBOARDS = {}
+
+
+def summarize(text, final=False):
+    """One line for a dashboard entry from a full status text"""
+    lines = [line.replace('*', '').replace('`', '').strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    if not lines:
+        return ""
+
+    parts = [lines[0]]
+    position = POSITION_PATTERN.search(text)
+    percent = PERCENT_PATTERN.search(text)
+    eta = ETA_PATTERN.search(text)
+    if position:
+        parts.append(f"#{position.group(1)}")
+    if percent:
+        parts.append(f"{float(percent.group(1)):.0f}%")
+    if eta and eta.group(1) != "00:00":
+        parts.append(f"ETA {eta.group(1)}")
+    # Errors and other final states keep their explanation
+    if final and not percent and len(lines) > 1:
+        parts.append(lines[1][:100])
+    return " · ".join(parts)
+
+
+class JobStatus:
+    """A job's entry on its user's dashboard, used in place of a status message"""
+
+    def __init__(self, dashboard, job, text):
+        self.dashboard = dashboard
+        self.job = job
+        self.text = text
+        self.final = False
+
+    @property
+    def id(self):
+        return self.dashboard.message.id
+
+    @property
+    def chat(self):
+        return self.dashboard.message.chat
+
+    @property
+    def name(self):
+        job = self.job
+        if job.renamed_file_name:
+            return job.renamed_file_name
+        media = job.message.document or job.message.video or job.message.audio
+        return job.file_name or getattr(media, "file_name", None) or "File"
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+        self.dashboard.refresh()
+
+    async def delete(self):
+        """The job is done - drop its entry"""
+        forget_progress(self)
+        self.dashboard.entries.pop(self.job.job_id, None)
+        await self.dashboard.settle()
+
+    async def close(self):
+        """The job ended without an upload - keep its last text as a final entry"""
+        forget_progress(self)
+        if self.dashboard.entries.get(self.job.job_id) is self and not self.final:
+            self.final = True
+            await self.dashboard.settle()
+
+
+class Dashboard:
+    """One status message per user listing every file they have in flight.
+
+    Entries are rendered into a single message that is edited through the
+    edit scheduler, so however many files are running the user's chat
+    gets edits at the scheduler's per-chat rate. Once nothing is running
+    the message is deleted, or left with the failed / cancelled entries.
+    """
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.message = None
+        self.entries = OrderedDict()
+        self.lock = asyncio.Lock()
+
+    def render(self):
+        entries = list(self.entries.values())
+        running = sum(1 for entry in entries if not entry.final)
+        lines = [f"**📋 Your Files** ({running} in progress)"]
+        buttons = []
+        for number, entry in enumerate(entries[:MAX_SHOWN], start=1):
+            lines.append(f"\n**{number}.** `{entry.name}`\n{summarize(entry.text, entry.final)}")
+            if not entry.final:
+                buttons.append(InlineKeyboardButton(f"❌ {number}", callback_data=f"cancel:{entry.job.job_id}"))
+        if len(entries) > MAX_SHOWN:
+            lines.append(f"\n... and {len(entries) - MAX_SHOWN} more")
+
+        rows = [buttons[i:i + BUTTONS_PER_ROW] for i in range(0, len(buttons), BUTTONS_PER_ROW)]
+        return "\n".join(lines), InlineKeyboardMarkup(rows) if rows else None
+
+    def refresh(self):
+        if self.message:
+            text, markup = self.render()
+            EDIT_SCHEDULER.submit(self.message, text, reply_markup=markup)
+
+    async def settle(self):
+        """Refresh, or close the dashboard once none of its jobs are running"""
+        if any(not entry.final for entry in self.entries.values()):
+            self.refresh()
+            return
+
+        if DASHBOARDS.get(self.user_id) is self:
+            del DASHBOARDS[self.user_id]
+        if not self.message:
+            return
+        if self.entries:
+            self.refresh()
+        else:
+            EDIT_SCHEDULER.forget(self.message)
+            try:
+                await self.message.delete()
+            except Exception:
+                pass
+
+
+async def open_status(job, text):
+    """Add a job to its user's dashboard, sending the dashboard message if needed"""
+    dashboard = DASHBOARDS.get(job.user_id)
+    if not dashboard:
+        dashboard = DASHBOARDS[job.user_id] = Dashboard(job.user_id)
+
+    status = JobStatus(dashboard, job, text)
+    dashboard.entries[job.job_id] = status
+    async with dashboard.lock:
+        if not dashboard.message:
+            text, markup = dashboard.render()
+            try:
+                dashboard.message = await job.message.reply_text(text, reply_markup=markup)
+            except Exception:
+                del dashboard.entries[job.job_id]
+                raise
+            return status
+    dashboard.refresh()
+    return status
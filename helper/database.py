@@ -1,100 +1,168 @@
-import motor.motor_asyncio
+import time
+from collections import OrderedDict
 from config import Config
+from helper.storage import create_storage
+
+# Per-user settings read on every job
+SETTINGS_FIELDS = ("format_template", "caption", "thumbnail", "media_preference")
 
 class Database:
-    def __init__(self, uri, database_name):
-        self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
-        self.db = self._client[database_name]
-        self.users = self.db.users
+    def __init__(self, storage):
+        self.storage = storage
+        self.users = storage.collection("users")
+        self.jobs = storage.collection("jobs")
+        self.outputs = storage.collection("output_cache")
+        self.broadcasts = storage.collection("broadcasts")
+        # user_id -> (expires_at, settings), least recently used first
+        self._settings = OrderedDict()
+        self._settings_writes = 0
 
     async def add_user(self, bot, message):
         """Add user to database"""
         user_id = message.from_user.id
-        user_data = await self.users.find_one({"_id": user_id})
+        user_data = await self.users.get(user_id)
         
         if user_data:
             return
         
-        await self.users.insert_one({
+        await self.users.insert({
             "_id": user_id,
             "format_template": None,
             "caption": None,
             "thumbnail": None,
             "media_preference": None
         })
+        self._settings.pop(user_id, None)
 
     async def total_users_count(self):
         """Get total users count"""
-        count = await self.users.count_documents({})
+        count = await self.users.count()
         return count
 
     async def get_all_users(self):
         """Get all users"""
-        return self.users.find({})
+        return self.users.find()
 
     async def delete_user(self, user_id):
         """Delete user from database"""
-        await self.users.delete_one({"_id": user_id})
+        await self.users.delete(user_id)
+        self._settings.pop(user_id, None)
+
+    async def delete_users(self, user_ids):
+        """Delete many users in one batch"""
+        await self.users.delete_many(user_ids)
+        for user_id in user_ids:
+            self._settings.pop(user_id, None)
+
+    async def get_user_ids(self, after=None):
+        """Get user ids in ascending order, optionally only those after ``after``"""
+        return self.users.find(after=after, fields=())
+
+    async def get_user_settings(self, user_id):
+        """Get all per-user settings with one projected query, cached for SETTINGS_CACHE_TTL"""
+        cached = self._settings.get(user_id)
+        if cached and cached[0] > time.monotonic():
+            self._settings.move_to_end(user_id)
+            return dict(cached[1])
+
+        writes = self._settings_writes
+        user_data = await self.users.get(user_id, fields=SETTINGS_FIELDS) or {}
+        settings = {field: user_data.get(field) for field in SETTINGS_FIELDS}
+        # A set_* call while the query ran may have made this result stale
+        if writes == self._settings_writes:
+            self._cache_settings(user_id, settings)
+        return dict(settings)
+
+    def _cache_settings(self, user_id, settings):
+        if Config.SETTINGS_CACHE_TTL <= 0:
+            return
+        self._settings[user_id] = (time.monotonic() + Config.SETTINGS_CACHE_TTL, settings)
+        self._settings.move_to_end(user_id)
+        while len(self._settings) > Config.SETTINGS_CACHE_SIZE:
+            self._settings.popitem(last=False)
+
+    def _update_cached_setting(self, user_id, field, value):
+        """Write-through so the next read after a set_* call sees the new value"""
+        self._settings_writes += 1
+        cached = self._settings.get(user_id)
+        if cached:
+            cached[1][field] = value
 
     async def set_format_template(self, user_id, format_template):
         """Set auto rename format template"""
-        await self.users.update_one(
-            {"_id": user_id},
-            {"$set": {"format_template": format_template}},
-            upsert=True
-        )
+        await self.users.update(user_id, {"format_template": format_template})
+        self._update_cached_setting(user_id, "format_template", format_template)
 
     async def get_format_template(self, user_id):
         """Get auto rename format template"""
-        user_data = await self.users.find_one({"_id": user_id})
-        if user_data:
-            return user_data.get("format_template")
-        return None
+        settings = await self.get_user_settings(user_id)
+        return settings["format_template"]
 
     async def set_caption(self, user_id, caption):
         """Set custom caption"""
-        await self.users.update_one(
-            {"_id": user_id},
-            {"$set": {"caption": caption}},
-            upsert=True
-        )
+        await self.users.update(user_id, {"caption": caption})
+        self._update_cached_setting(user_id, "caption", caption)
 
     async def get_caption(self, user_id):
         """Get custom caption"""
-        user_data = await self.users.find_one({"_id": user_id})
-        if user_data:
-            return user_data.get("caption")
-        return None
+        settings = await self.get_user_settings(user_id)
+        return settings["caption"]
 
     async def set_thumbnail(self, user_id, file_id):
         """Set custom thumbnail"""
-        await self.users.update_one(
-            {"_id": user_id},
-            {"$set": {"thumbnail": file_id}},
-            upsert=True
-        )
+        await self.users.update(user_id, {"thumbnail": file_id})
+        self._update_cached_setting(user_id, "thumbnail", file_id)
 
     async def get_thumbnail(self, user_id):
         """Get custom thumbnail"""
-        user_data = await self.users.find_one({"_id": user_id})
-        if user_data:
-            return user_data.get("thumbnail")
-        return None
+        settings = await self.get_user_settings(user_id)
+        return settings["thumbnail"]
 
     async def set_media_preference(self, user_id, media_type):
         """Set media upload preference"""
-        await self.users.update_one(
-            {"_id": user_id},
-            {"$set": {"media_preference": media_type}},
-            upsert=True
-        )
+        await self.users.update(user_id, {"media_preference": media_type})
+        self._update_cached_setting(user_id, "media_preference", media_type)
 
     async def get_media_preference(self, user_id):
         """Get media upload preference"""
-        user_data = await self.users.find_one({"_id": user_id})
-        if user_data:
-            return user_data.get("media_preference")
-        return None
+        settings = await self.get_user_settings(user_id)
+        return settings["media_preference"]
+
+    async def save_job(self, job_id, data):
+        """Create or update a job journal entry"""
+        await self.jobs.update(job_id, data)
+
+    async def delete_job(self, job_id):
+        """Remove a finished job from the journal"""
+        await self.jobs.delete(job_id)
+
+    async def get_pending_jobs(self):
+        """Get all journaled jobs, oldest first"""
+        return self.jobs.find(sort="created_at")
+
+    async def get_cached_output(self, key):
+        """Get an already uploaded output for a cache key"""
+        return await self.outputs.get(key)
+
+    async def set_cached_output(self, key, data):
+        """Remember the uploaded output for a cache key"""
+        await self.outputs.update(key, data)
+
+    async def delete_cached_output(self, key):
+        """Forget a cached output (e.g. when its file_id stopped working)"""
+        await self.outputs.delete(key)
+
+    async def save_broadcast(self, broadcast_id, data):
+        """Checkpoint a running broadcast"""
+        await self.broadcasts.update(broadcast_id, {key: value for key, value in data.items() if key != "_id"})
+
+    async def get_broadcasts(self):
+        """Get unfinished broadcasts"""
+        return [broadcast async for broadcast in self.broadcasts.find()]
+
+    async def delete_broadcast(self, broadcast_id):
+        """Remove a finished broadcast"""
+        await self.broadcasts.delete(broadcast_id)
 
 # Initialize database
-ZoroBhaiya = Database(Config.DB_URL, Config.DB_NAME)
+ZoroBhaiya = Database(create_storage(Config.DB_BACKEND, Config.DB_URL, Config.DB_NAME, Config.DB_PATH))
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from pyrogram.errors import FloodWait, MessageNotModified
+from config import Config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.ERROR)
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self):
+        """Seconds until a token is available"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+    def full(self):
+        self._refill()
+        return self.tokens >= self.burst
+
+
+class EditScheduler:
+    """Rate limited, coalescing sender for message edits.
+
+    Only the newest text of each message is kept while it waits, edits that
+    would not change the message are dropped, and sends are paced by a token
+    bucket per chat plus one for the whole bot. A FloodWait pauses every
+    edit for the time Telegram asks for.
+    """
+
+    SENT_HISTORY = 5000
+    SWEEP_INTERVAL = 60  # seconds between sweeps of idle chat buckets
+
+    def __init__(self, rate, chat_rate, burst=None, chat_burst=2):
+        self.bucket = TokenBucket(rate, burst or rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.pending = OrderedDict()
+        self.sent = OrderedDict()
+        self.in_flight = set()
+        self.paused_until = 0
+        self._swept = time.monotonic()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    @staticmethod
+    def _key(message):
+        return (message.chat.id, message.id)
+
+    def submit(self, message, text, **kwargs):
+        """Queue ``text`` as the next content of ``message``, replacing any waiting edit"""
+        key = self._key(message)
+        if key not in self.in_flight and self.sent.get(key) == self._content(text, kwargs):
+            self.pending.pop(key, None)
+            return
+        self.pending[key] = (message, text, kwargs)
+        if not self._task or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+
+    def forget(self, message):
+        """Drop waiting edits and history of a message that is being deleted"""
+        key = self._key(message)
+        self.pending.pop(key, None)
+        self.sent.pop(key, None)
+
+    @staticmethod
+    def _content(text, kwargs):
+        return (text, repr(kwargs.get("reply_markup")))
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if not bucket:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _sweep(self):
+        """Drop chat buckets that have refilled and have nothing waiting.
+
+        A new bucket starts out full, so this changes no pacing and keeps
+        the map from growing by one bucket for every chat ever edited.
+        """
+        busy = {key[0] for key in self.pending} | {key[0] for key in self.in_flight}
+        for chat_id, bucket in list(self.chat_buckets.items()):
+            if chat_id not in busy and bucket.full():
+                del self.chat_buckets[chat_id]
+        self._swept = time.monotonic()
+
+    def _next(self):
+        """Oldest waiting edit whose chat may be edited now, and the wait otherwise"""
+        wait = 1.0
+        for key in self.pending:
+            if key in self.in_flight:
+                continue
+            delay = self._chat_bucket(key[0]).delay()
+            if not delay:
+                return key, 0
+            wait = min(wait, delay)
+        return None, wait
+
+    async def _run(self):
+        while True:
+            if time.monotonic() - self._swept >= self.SWEEP_INTERVAL:
+                self._sweep()
+
+            if not self.pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            pause = self.paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+
+            delay = self.bucket.delay()
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+
+            key, wait = self._next()
+            if not key:
+                # Every waiting chat is rate limited - sleep until one frees up or a new edit arrives
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            message, text, kwargs = self.pending.pop(key)
+            self.bucket.take()
+            self._chat_bucket(key[0]).take()
+            self.in_flight.add(key)
+            asyncio.create_task(self._send(key, message, text, kwargs))
+
+    async def _send(self, key, message, text, kwargs):
+        try:
+            await message.edit_text(text, **kwargs)
+            self._remember(key, text, kwargs)
+        except MessageNotModified:
+            self._remember(key, text, kwargs)
+        except FloodWait as e:
+            self.paused_until = max(self.paused_until, time.monotonic() + e.value)
+            # Retry after the pause unless a newer text replaced it meanwhile
+            if key not in self.pending:
+                self.pending[key] = (message, text, kwargs)
+                self.pending.move_to_end(key, last=False)
+        except Exception as e:
+            logger.error(f"Message edit failed: {e}")
+        finally:
+            self.in_flight.discard(key)
+            self._wakeup.set()
+
+    def _remember(self, key, text, kwargs):
+        self.sent[key] = self._content(text, kwargs)
+        self.sent.move_to_end(key)
+        if len(self.sent) > self.SENT_HISTORY:
+            self.sent.popitem(last=False)
+
+
+EDIT_SCHEDULER = EditScheduler(Config.EDIT_RATE, Config.EDIT_RATE_CHAT)
@@ -0,0 +1,57 @@
+import logging
+from config import Config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# x264 presets from fastest to slowest
+PRESETS = ["ultrafast", "superfast", "veryfast", "faster", "fast", "medium"]
+
+# name, base preset, crf
+PROFILES = {
+    "idle":   ("fast", 23),
+    "normal": ("veryfast", 23),
+    "busy":   ("superfast", 23),
+    "rush":   ("ultrafast", 24),
+}
+
+
+def choose_profile(queue_depth, height=0, duration=0):
+    """Pick preset / crf / tune for a job from the backlog and the input size.
+
+    The backlog picks the base profile: a slower preset when nothing is
+    waiting, faster ones as the queue grows. Large inputs (1080p and up, or
+    longer than an hour) move one preset faster, small ones (480p and below)
+    one preset slower, except in rush mode.
+    """
+    if queue_depth >= Config.ENCODE_RUSH_QUEUE:
+        name = "rush"
+    elif queue_depth >= Config.ENCODE_BUSY_QUEUE:
+        name = "busy"
+    elif queue_depth == 0:
+        name = "idle"
+    else:
+        name = "normal"
+
+    preset, crf = PROFILES[name]
+    index = PRESETS.index(preset)
+    if height >= 1080 or duration > 3600:
+        index = max(0, index - 1)
+    elif 0 < height <= 480 and name != "rush":
+        index = min(len(PRESETS) - 1, index + 1)
+    preset = PRESETS[index]
+
+    tune = Config.ENCODE_TUNE or None
+    logger.info(
+        f"Encode profile {name}: preset={preset} crf={crf} tune={tune} "
+        f"(queue={queue_depth}, height={height}, duration={int(duration)}s)"
+    )
+    return {"name": name, "preset": preset, "crf": crf, "tune": tune}
+
+
+def profile_args(profile):
+    """libx264 arguments for a profile"""
+    args = ['-c:v', 'libx264', '-preset', profile["preset"], '-crf', str(profile["crf"])]
+    if profile["tune"]:
+        args += ['-tune', profile["tune"]]
+    return args
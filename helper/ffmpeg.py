@@ -0,0 +1,281 @@
+import asyncio
+import glob
+import os
+import shutil
+import signal
+from collections import deque
+
+LOG_LINES = 40
+
+
+class FFmpegProgress:
+    """Latest values from ffmpeg's -progress output"""
+
+    def __init__(self, out_time=0.0, fps=0.0, speed=0.0, total_size=0):
+        self.out_time = out_time
+        self.fps = fps
+        self.speed = speed
+        self.total_size = total_size
+
+
+class FFmpegRunner:
+    """One ffmpeg process with parsed progress, a bounded log and clean kill.
+
+    ``-progress pipe:1`` key=value blocks are parsed into ``progress`` and
+    ``on_progress`` is awaited after each block. stderr is always drained
+    into a ring buffer of the last ``log_lines`` lines, so a chatty run can
+    never block on a full pipe and a failure still has its error text.
+    ffmpeg runs in its own process group and is killed on timeout or when
+    the waiting task is cancelled. A governor ``lease`` gets the process
+    attached while it runs, so its CPU share can follow the lease.
+    """
+
+    def __init__(self, args, on_progress=None, timeout=None, stdin=False, log_lines=LOG_LINES,
+                 lease=None):
+        self.cmd = [
+            'ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'warning',
+            '-progress', 'pipe:1', *args
+        ]
+        self.on_progress = on_progress
+        self.timeout = timeout or None
+        self.use_stdin = stdin
+        self.lease = lease
+        self.log = deque(maxlen=log_lines)
+        self.progress = FFmpegProgress()
+        self.process = None
+        self.timed_out = False
+        self._readers = []
+
+    @property
+    def returncode(self):
+        return self.process.returncode if self.process else None
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.timed_out
+
+    @property
+    def stdin(self):
+        return self.process.stdin
+
+    def error_text(self, lines=5):
+        """Last lines ffmpeg wrote to stderr"""
+        return "\n".join(list(self.log)[-lines:])
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            *self.cmd,
+            stdin=asyncio.subprocess.PIPE if self.use_stdin else asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True
+        )
+        if self.lease:
+            self.lease.attach(self.process.pid)
+        self._readers = [
+            asyncio.create_task(self._read_progress()),
+            asyncio.create_task(self._read_log()),
+        ]
+        return self
+
+    async def wait(self):
+        """Wait for ffmpeg to exit, killing it on timeout or cancellation"""
+        try:
+            await asyncio.wait_for(self._finish(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out = True
+            self.log.append(f"Timed out after {self.timeout}s")
+            self.kill()
+            await self._finish()
+        except asyncio.CancelledError:
+            self.kill()
+            await asyncio.shield(self._finish())
+            raise
+        return self.returncode
+
+    def kill(self):
+        """Kill ffmpeg and anything it started"""
+        if not self.process or self.process.returncode is not None:
+            return
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        except AttributeError:
+            self.process.kill()
+
+    async def _finish(self):
+        await asyncio.gather(*self._readers, return_exceptions=True)
+        await self.process.wait()
+        if self.lease:
+            self.lease.detach(self.process.pid)
+
+    async def _read_progress(self):
+        values = {}
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            key, _, value = line.decode('utf-8', errors='ignore').strip().partition('=')
+            if key != 'progress':
+                values[key] = value
+                continue
+
+            progress = self.progress
+            if values.get('out_time_us', '').isdigit():
+                progress.out_time = int(values['out_time_us']) / 1_000_000
+            if values.get('total_size', '').isdigit():
+                progress.total_size = int(values['total_size'])
+            try:
+                progress.fps = float(values.get('fps', ''))
+            except ValueError:
+                pass
+            try:
+                progress.speed = float(values.get('speed', '').rstrip('x'))
+            except ValueError:
+                pass
+            values = {}
+
+            if self.on_progress:
+                try:
+                    await self.on_progress(progress)
+                except Exception:
+                    pass
+
+    async def _read_log(self):
+        buffer = b""
+        while True:
+            chunk = await self.process.stderr.read(4096)
+            if not chunk:
+                break
+            lines = (buffer + chunk).replace(b"\r", b"\n").split(b"\n")
+            buffer = lines.pop()[-4096:]
+            self.log.extend(line.decode('utf-8', errors='ignore') for line in lines if line.strip())
+        if buffer.strip():
+            self.log.append(buffer.decode('utf-8', errors='ignore'))
+
+
+async def run_ffmpeg(args, on_progress=None, timeout=None, lease=None):
+    """Run ffmpeg with ``args`` to completion, returns the finished FFmpegRunner"""
+    runner = FFmpegRunner(args, on_progress=on_progress, timeout=timeout, lease=lease)
+    await runner.start()
+    await runner.wait()
+    return runner
+
+
+async def split_segments(input_path, workdir, segment_seconds, timeout=None):
+    """Split the first video stream at keyframes into stream-copied segments"""
+    runner = await run_ffmpeg([
+        '-i', input_path,
+        '-map', '0:v:0', '-c', 'copy',
+        '-f', 'segment',
+        '-segment_time', str(segment_seconds),
+        '-reset_timestamps', '1',
+        '-y', os.path.join(workdir, 'seg_%04d.mkv')
+    ], timeout=timeout)
+    if not runner.ok:
+        return []
+    return sorted(glob.glob(os.path.join(workdir, 'seg_*.mkv')))
+
+
+async def _encode_segment(segment, output, video_args, index, progress, on_progress, timeout=None,
+                          lease=None, input_args=None):
+    """Encode one segment, reporting its progress into ``progress``"""
+    async def report(current):
+        progress[index] = current
+        if on_progress:
+            await on_progress(FFmpegProgress(
+                out_time=sum(p.out_time for p in progress.values()),
+                fps=sum(p.fps for p in progress.values()),
+                speed=sum(p.speed for p in progress.values()),
+                total_size=sum(p.total_size for p in progress.values()),
+            ))
+
+    runner = await run_ffmpeg([
+        *(input_args or []),
+        '-i', segment,
+        *video_args,
+        '-an', '-sn',
+        '-y', output
+    ], on_progress=report, timeout=timeout, lease=lease)
+    # Finished segments no longer add to the combined fps / speed
+    if index in progress:
+        progress[index] = FFmpegProgress(out_time=progress[index].out_time,
+                                         total_size=progress[index].total_size)
+    return runner.ok
+
+
+async def encode_segments(segments, workdir, video_args, workers, on_progress=None, timeout=None,
+                          lease=None, input_args=None):
+    """Encode segments in parallel with at most ``workers`` ffmpeg processes"""
+    semaphore = asyncio.Semaphore(max(1, workers))
+    progress = {}
+    outputs = [os.path.join(workdir, f'enc_{index:04d}.mkv') for index in range(len(segments))]
+
+    async def encode(index):
+        async with semaphore:
+            return await _encode_segment(
+                segments[index], outputs[index], video_args, index, progress, on_progress, timeout, lease,
+                input_args
+            )
+
+    tasks = [asyncio.create_task(encode(index)) for index in range(len(segments))]
+    try:
+        for task in asyncio.as_completed(tasks):
+            if not await task:
+                return []
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return outputs
+
+
+async def concat_segments(encoded, input_path, output_path, workdir, mux_args, map_args=None, timeout=None):
+    """Join encoded segments losslessly and mux back every other stream of the source"""
+    list_path = os.path.join(workdir, 'segments.txt')
+    with open(list_path, 'w') as f:
+        for path in encoded:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+
+    runner = await run_ffmpeg([
+        '-f', 'concat', '-safe', '0', '-i', list_path,
+        '-i', input_path,
+        '-map', '0:v', *(map_args or ['-map', '1']), '-map', '-1:v:0',
+        '-c', 'copy',
+        *mux_args,
+        '-y', output_path
+    ], timeout=timeout)
+    return runner.ok
+
+
+async def segmented_encode(input_path, output_path, duration, video_args, mux_args, workers,
+                           on_progress=None, map_args=None, timeout=None, lease=None, input_args=None):
+    """Encode the main video stream as parallel keyframe segments.
+
+    The video is split at keyframes, each piece is encoded with ``video_args``
+    by up to ``workers`` concurrent ffmpeg processes (``input_args`` go before
+    their ``-i``, for decoder options), and the results are
+    concatenated with stream copy. Audio, subtitles and attachments are copied
+    from the source (input 1 of the final mux, selected by ``map_args``).
+    ``timeout`` applies to every ffmpeg process on its own and the segment
+    encodes run under the governor ``lease``.
+    Returns True when ``output_path`` was written.
+    """
+    workdir = f"{output_path}.segments"
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        # More segments than workers so uneven keyframe spacing still balances out
+        segment_seconds = max(10, int(duration / (workers * 2)) + 1)
+        segments = await split_segments(input_path, workdir, segment_seconds, timeout)
+        if not segments:
+            return False
+
+        encoded = await encode_segments(segments, workdir, video_args, workers, on_progress, timeout, lease,
+                                        input_args)
+        if not encoded:
+            return False
+
+        return await concat_segments(encoded, input_path, output_path, workdir, mux_args, map_args, timeout)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,304 @@
+import os
+import re
+
+# Regex chain used before the tokenizer, kept as a fallback for names it finds no episode in
+EPISODE_PATTERNS = [
+    re.compile(r'[\s\-_](\d{3,4})[\s\-_\[]', re.IGNORECASE),
+    re.compile(r'^(\d{3,4})[\s\-_\[]', re.IGNORECASE),
+    re.compile(r'[\]\)][\s\-_]?(\d{3,4})[\s\-_\[]', re.IGNORECASE),
+    re.compile(r'[Ee][Pp]?[\s\-_]?(\d+)', re.IGNORECASE),
+    re.compile(r'[Ee]pisode[\s\-_]?(\d+)', re.IGNORECASE),
+    re.compile(r'S\d+[Ee](\d+)', re.IGNORECASE),
+    re.compile(r'[\-_\s](\d{1,4})[\.\-_\s]*(?:v\d+)?$', re.IGNORECASE),
+]
+
+SEASON_PATTERNS = [
+    re.compile(r'[Ss]eason[\s\-_]?(\d+)', re.IGNORECASE),
+    re.compile(r'[Ss](\d+)[Ee]\d+', re.IGNORECASE),
+    re.compile(r'[\s\-_][Ss](\d+)[\s\-_\[]', re.IGNORECASE),
+]
+
+QUALITY_PATTERNS = [
+    re.compile(r'\[(\d{3,4}[pP])\]', re.IGNORECASE),
+    re.compile(r'\((\d{3,4}[pP])\)', re.IGNORECASE),
+    re.compile(r'[\s\-_](\d{3,4}[pP])[\s\-_\[]', re.IGNORECASE),
+    re.compile(r'\b(\d{3,4}[pP])\b', re.IGNORECASE),
+    re.compile(r'\b(4[Kk])\b', re.IGNORECASE),
+    re.compile(r'\b(2[Kk])\b', re.IGNORECASE),
+    re.compile(r'\b([Hh][Dd][Rr][Ii][Pp])\b', re.IGNORECASE),
+]
+
+def extract_metadata_regex(filename):
+    """Extract episode, season, quality from filename"""
+    name_only = os.path.splitext(filename)[0]
+
+    episode = None
+    season = None
+    quality = None
+
+    for pattern in EPISODE_PATTERNS:
+        match = pattern.search(name_only)
+        if match:
+            episode = match.group(1)
+            break
+
+    for pattern in SEASON_PATTERNS:
+        match = pattern.search(name_only)
+        if match:
+            season = match.group(1)
+            break
+
+    for pattern in QUALITY_PATTERNS:
+        match = pattern.search(name_only)
+        if match:
+            quality = match.group(1)
+            if quality.lower() in ['4k', '2k']:
+                quality = quality.upper()
+            elif 'p' in quality.lower():
+                quality = quality.lower()
+            elif 'hdrip' in quality.lower():
+                quality = 'HDRIP'
+            break
+
+    if not season:
+        season = '1'
+    if not quality:
+        quality = 'Unknown'
+
+    return episode, season, quality
+
+
+ORDINALS = {"first": "1", "second": "2", "third": "3", "fourth": "4", "fifth": "5", "sixth": "6"}
+
+# Plain words that change how the next token is read, in the spellings release names use
+KEYWORDS = {}
+for word, keyword in [("episode", "episode"), ("ep", "episode"), ("e", "episode"), ("season", "season"),
+                      ("hdrip", "hdrip"), *((ordinal, "ordinal") for ordinal in ORDINALS)]:
+    for spelling in (word, word.title(), word.upper()):
+        KEYWORDS[spelling] = keyword
+KEYWORDS["HDRip"] = "hdrip"
+
+SEPARATORS = {
+    "[": "open", "(": "open", "{": "open", "]": "close", ")": "close", "}": "close",
+    "#": "episode", "-": "join", "~": "join",
+}
+for before in " _":
+    for after in " _":
+        SEPARATORS.update({f"{before}-{after}": "dash", f"{before}–{after}": "dash", f"{before}~{after}": "join"})
+
+CODEC_NUMBERS = {"264", "265"}
+CODEC_PREFIXES = {"h", "H", "x", "X"}
+
+# Brackets, "#", "-", "~", spaced dashes and tildes, and runs of letters and digits, which keep
+# a one digit decimal so "AAC2.0" and "5.1" stay whole. Spaces, dots and underscores only separate.
+TOKEN_PATTERN = re.compile(r"[\[\](){}#~-]|[ _][-–~][ _]|[A-Za-z0-9]+(?:\.\d(?![A-Za-z0-9]))?")
+
+# Tokens mixing letters and digits, and decimals. Episode numbers may be a half
+# episode like 12.5 - other decimals are audio layouts (2.0, 5.1)
+MIXED_TOKEN = re.compile(r"""
+    S(?P<sxe_season>\d{1,2})E(?P<sxe_episode>\d{1,4}(?:\.5)?)(?:v\d)?
+  | S(?P<season>\d{1,2})
+  | (?:Episode|Ep|E)(?P<episode>\d{1,4}(?:\.5)?)(?:v\d)?
+  | (?P<decimal>\d{1,4}\.5)
+  | (?:BD|WEB|HD)?(?P<lines>\d{3,4})p
+  | (?P<k>[24])K
+  | (?P<ordinal>\d{1,2})(?:st|nd|rd|th)
+  | (?P<number>\d{1,4})v\d
+  | \d{3,4}x(?P<height>\d{3,4})
+""", re.IGNORECASE | re.VERBOSE)
+
+DIGITS = re.compile(r"\d+")
+
+# Confidence of the places an episode number is found in
+SCORE_SXE = 100
+SCORE_MARKED = 90      # Episode 5, Ep05, E05, #05
+SCORE_AFTER_DASH = 80  # Show - 05
+SCORE_LEADING = 70     # 05 - Show
+SCORE_BARE = 50        # Show 05 720p
+SCORE_BRACKETED = 40   # Show [05]
+
+# Mixed tokens repeat across names (1080p, x265, S01E05, ...) - remember how each was read
+_mixed_tokens = {}
+MIXED_CACHE_SIZE = 4096
+
+
+def _is_year(digits):
+    return len(digits) == 4 and 1950 <= int(digits) <= 2039
+
+
+def _read_mixed(token):
+    """(kind, value, extra) for a token mixing letters and digits"""
+    reading = _mixed_tokens.get(token)
+    if reading:
+        return reading
+
+    match = MIXED_TOKEN.fullmatch(token)
+    kind = match.lastgroup if match else None
+    if kind == "sxe_episode":
+        reading = ("sxe", match.group("sxe_episode"), match.group("sxe_season"))
+    elif kind in ("season", "episode", "number", "decimal", "ordinal"):
+        reading = (kind, match.group(kind), None)
+    elif kind == "lines":
+        reading = ("quality", f"{match.group('lines')}p", (match.group("lines"),))
+    elif kind == "k":
+        reading = ("quality", f"{match.group('k')}K", (match.group("k"),))
+    elif kind == "height":
+        reading = ("quality", f"{match.group('height')}p", tuple(token.lower().split("x")))
+    else:
+        reading = ("other", None, tuple(DIGITS.findall(token)))
+
+    if len(_mixed_tokens) >= MIXED_CACHE_SIZE:
+        _mixed_tokens.clear()
+    _mixed_tokens[token] = reading
+    return reading
+
+
+def parse_filename(filename):
+    """Single-pass tokenizer: (episode, season, quality, ignored) where ignored holds
+    the numbers it recognised as years, resolutions or codecs.
+
+    Every number is scored by where it sits (after " - ", in brackets, after
+    Episode / E / #, ...) and the best episode candidate wins, later ones on
+    ties. Batch packs give a range like ``01-12``. The file extension is just
+    one more word token.
+    """
+    episode = None
+    episode_score = 0
+    season = None
+    quality = None
+    ignored = set()
+    depth = 0
+    seen_word = False
+    leading = None
+    dashed = False    # previous token was " - "
+    marker = None     # "episode" or "season" word right before
+    ordinal = None    # "2nd" / "Second" waiting for "Season"
+    last = None       # previous token if it was an episode candidate, for ranges
+    joiner = False    # "-" or "~" right after it
+    previous = ""     # token before, for "H.264"
+
+    for token in TOKEN_PATTERN.findall(filename):
+        separator = SEPARATORS.get(token)
+        if separator:
+            if separator == "open":
+                depth += 1
+            elif separator == "close":
+                if depth:
+                    depth -= 1
+            elif separator == "join":
+                joiner = True
+            elif separator == "episode":
+                marker = "episode"
+            else:
+                # " - " between title and episode
+                dashed = True
+                joiner = False
+                if leading and not seen_word and episode_score < SCORE_LEADING:
+                    episode, episode_score = leading, SCORE_LEADING
+            continue
+
+        if token.isalpha():
+            keyword = KEYWORDS.get(token)
+            if keyword is None:
+                marker = ordinal = None
+            elif keyword == "ordinal":
+                ordinal = ORDINALS[token.lower()]
+                marker = None
+            elif keyword == "season" and ordinal:
+                season = season or ordinal
+                marker = ordinal = None
+            else:
+                if keyword == "hdrip":
+                    quality = quality or "HDRIP"
+                marker = keyword
+                ordinal = None
+            # Group tags in brackets are not part of the title
+            if not depth:
+                seen_word = True
+            last = None
+
+        elif token.isdigit():
+            if joiner and previous[-1:].isdigit():
+                # Second half of a range - an episode range extends the episode, others are dropped
+                if last and episode == last and float(last) < int(token):
+                    episode = f"{last}-{token}"
+                last = None
+            elif marker == "episode":
+                if episode_score <= SCORE_MARKED:
+                    episode, episode_score = token, SCORE_MARKED
+                last = token
+            elif marker == "season":
+                season = season or token
+                last = None
+            elif len(token) > 4 or _is_year(token) or (token in CODEC_NUMBERS and previous in CODEC_PREFIXES):
+                ignored.add(token)
+                last = None
+            else:
+                if depth:
+                    score = SCORE_BRACKETED
+                elif dashed:
+                    score = SCORE_AFTER_DASH
+                else:
+                    score = SCORE_BARE
+                    if not seen_word and leading is None:
+                        leading = token
+                if score >= episode_score:
+                    episode, episode_score = token, score
+                last = token
+            marker = ordinal = None
+
+        else:
+            # Letters and digits together: S01E05, E05, 1080p, 4K, 2nd, 01v2, x265, AAC2.0, ...
+            kind, value, extra = _read_mixed(token)
+            if kind == "sxe":
+                season = season or extra
+                episode, episode_score = value, SCORE_SXE
+                last = value
+            elif kind == "episode":
+                if joiner and last and episode == last and float(last) < float(value):
+                    episode = f"{last}-{value}"
+                elif episode_score <= SCORE_MARKED:
+                    episode, episode_score = value, SCORE_MARKED
+                last = value
+            elif kind in ("number", "decimal"):
+                if marker == "episode":
+                    score = SCORE_MARKED
+                else:
+                    score = SCORE_BRACKETED if depth else SCORE_AFTER_DASH if dashed else SCORE_BARE
+                if score >= episode_score:
+                    episode, episode_score = value, score
+                last = value
+            else:
+                last = None
+                if kind == "season":
+                    season = season or value
+                elif kind == "quality":
+                    quality = quality or value
+                    ignored.update(extra)
+                elif kind == "other":
+                    ignored.update(extra)
+            ordinal = value if kind == "ordinal" else None
+            if not depth:
+                seen_word = True
+            marker = None
+
+        joiner = dashed = False
+        previous = token
+
+    return episode, season, quality, ignored
+
+
+def extract_metadata(filename):
+    """Extract episode, season, quality from filename.
+
+    The tokenizer decides first; the regex chain only fills an episode the
+    tokenizer found nothing for, and never with a number the tokenizer
+    already knows is a year, resolution or codec.
+    """
+    episode, season, quality, ignored = parse_filename(filename)
+    if episode is None or not quality:
+        fallback_episode, _, fallback_quality = extract_metadata_regex(filename)
+        if episode is None and fallback_episode not in ignored:
+            episode = fallback_episode
+        quality = quality or fallback_quality
+    return episode, season or '1', quality or 'Unknown'
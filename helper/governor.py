@@ -0,0 +1,185 @@
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+
+# Time constant of the 1 minute load average, in seconds
+LOAD_WINDOW = 60
+
+
+class Lease:
+    """The CPU share of one running encode and the ffmpeg processes using it.
+
+    ``threads`` is the encode's current share. ``max_threads`` is fixed when
+    the encode starts and is what ffmpeg's ``-threads`` options should get:
+    with CPU pinning it is the whole machine and the share is enforced by
+    the CPUs the processes may run on, without it the two are the same.
+    """
+
+    def __init__(self, threads, max_threads):
+        self.threads = threads
+        self.max_threads = max_threads
+        self.cpus = None
+        self.pids = set()
+
+    def attach(self, pid):
+        """Count a started ffmpeg process against this lease"""
+        self.pids.add(pid)
+        self.pin(pid)
+
+    def detach(self, pid):
+        self.pids.discard(pid)
+
+    def pin(self, pid):
+        """Move every thread of ``pid`` onto the lease's CPUs"""
+        if not self.cpus:
+            return
+        try:
+            tasks = os.listdir(f"/proc/{pid}/task")
+        except OSError:
+            tasks = [pid]
+        for task in tasks:
+            try:
+                os.sched_setaffinity(int(task), self.cpus)
+            except (OSError, ValueError):
+                pass
+
+
+class TranscodeGovernor:
+    """Hands out CPU thread budgets to concurrent ffmpeg encodes.
+
+    Budgets come from the governor's own bookkeeping: the cores it may use
+    minus the threads its running encodes hold. The 1 minute load average
+    only counts as other processes' load where it is above a decayed average
+    of our own thread usage, so encodes that have just finished do not
+    shrink the next one's budget.
+
+    Where the platform supports CPU affinity (Linux) every encode is pinned
+    to its own slice of CPUs and the slices are re-shared among the running
+    encodes whenever one starts or finishes, so a long encode picks up the
+    cores a finished one gave back. Elsewhere each encode keeps the budget
+    it started with; budgets are then recomputed every time an encode starts,
+    counting the ``backlog`` callable's queued jobs, so they shrink while the
+    backlog is long and grow again when it drains.
+    """
+
+    def __init__(self, max_jobs=0, threads_per_job=0, min_threads=2, backlog=None):
+        try:
+            self.cpus = sorted(os.sched_getaffinity(0))
+        except AttributeError:
+            self.cpus = None
+        self.cores = len(self.cpus) if self.cpus else os.cpu_count() or 1
+        self.backlog = backlog
+        self.max_jobs = max(0, max_jobs)
+        self.threads_per_job = max(0, threads_per_job)
+        self.min_threads = max(1, min(min_threads, self.cores))
+        # A fixed per-encode budget is not re-shared
+        self.pinning = bool(self.cpus) and not self.threads_per_job
+        self.running = []
+        self.waiting = 0
+        self._own_load = 0.0
+        self._own_load_at = time.monotonic()
+        self._cond = asyncio.Condition()
+
+    def in_use(self):
+        return sum(lease.threads for lease in self.running)
+
+    def own_threads(self):
+        """Threads our ffmpeg processes run, which can be more than their shares"""
+        return sum(lease.max_threads for lease in self.running)
+
+    def own_load(self):
+        """Our encode threads, decayed like the 1 minute load average.
+
+        Has to be called before ``running`` changes so the old usage is
+        counted up to the change.
+        """
+        now = time.monotonic()
+        decay = math.exp(-(now - self._own_load_at) / LOAD_WINDOW)
+        self._own_load = self._own_load * decay + self.own_threads() * (1 - decay)
+        self._own_load_at = now
+        return self._own_load
+
+    def capacity(self):
+        """Cores available to our encodes right now"""
+        try:
+            load = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            load = 0.0
+        external = max(0.0, load - max(self.own_load(), self.own_threads()))
+        return max(self.min_threads, int(self.cores - external))
+
+    def _grant(self):
+        """Thread budget for the next encode, or 0 if it has to wait"""
+        if self.max_jobs and len(self.running) >= self.max_jobs:
+            return 0
+
+        capacity = self.capacity()
+        if self.pinning:
+            # Every running encode gives up part of its slice to the new one
+            share = capacity // (len(self.running) + 1)
+            return share if share >= self.min_threads else 0
+
+        if self.threads_per_job:
+            want = min(self.threads_per_job, capacity)
+        else:
+            # Fair share between running encodes, waiting ones and queued work
+            waiting = max(1, self.waiting) + (self.backlog() if self.backlog else 0)
+            want = max(self.min_threads, capacity // (len(self.running) + waiting))
+
+        if not self.running:
+            return want
+        free = capacity - self.in_use()
+        need = want if self.threads_per_job else self.min_threads
+        if free < need:
+            return 0
+        return min(want, free)
+
+    def _reshare(self):
+        """Split the capacity evenly between running encodes and re-pin them"""
+        if not self.pinning or not self.running:
+            return
+        capacity = min(self.capacity(), len(self.cpus))
+        share, extra = divmod(capacity, len(self.running))
+        start = 0
+        for index, lease in enumerate(self.running):
+            lease.threads = max(1, share + (index < extra))
+            lease.cpus = self.cpus[start:start + lease.threads] or self.cpus[-lease.threads:]
+            start += lease.threads
+            for pid in list(lease.pids):
+                lease.pin(pid)
+
+    @asynccontextmanager
+    async def lease(self):
+        """Wait for a slot and yield the encode's Lease"""
+        async with self._cond:
+            self.waiting += 1
+            try:
+                threads = self._grant()
+                while not threads:
+                    await self._cond.wait()
+                    threads = self._grant()
+            finally:
+                self.waiting -= 1
+            self.own_load()
+            lease = Lease(threads, self.cores if self.pinning else threads)
+            self.running.append(lease)
+            self._reshare()
+        try:
+            yield lease
+        finally:
+            async with self._cond:
+                self.own_load()
+                self.running.remove(lease)
+                self._reshare()
+                self._cond.notify_all()
+
+    def stats(self):
+        return {
+            "cores": self.cores,
+            "capacity": self.capacity(),
+            "running": len(self.running),
+            "threads": self.in_use(),
+            "waiting": self.waiting,
+        }
@@ -0,0 +1,97 @@
+import asyncio
+
+
+class Stage:
+    """A pipeline step with its own input queue and worker pool"""
+
+    def __init__(self, name, handler, workers, maxsize=0):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=max(0, maxsize))
+        self.busy = 0
+        self._tasks = []
+
+
+class Pipeline:
+    """Chain of stages that hand jobs to each other through bounded queues.
+
+    A stage handler receives the job and returns the name of the next stage,
+    or None when the job is finished. A full downstream queue blocks the
+    upstream worker, which bounds how far ahead a fast stage (e.g. downloads)
+    can run of a slow one (e.g. transcodes).
+
+    Each handler call runs as ``job.task``; ``cancel`` stops it there, or
+    skips the job if it is still waiting in a stage queue.
+    """
+
+    def __init__(self):
+        self.stages = {}
+
+    def add_stage(self, name, handler, workers, maxsize=0):
+        self.stages[name] = Stage(name, handler, workers, maxsize)
+
+    def _ensure_workers(self):
+        """Start every stage's workers on first use"""
+        for stage in self.stages.values():
+            if stage._tasks:
+                continue
+            for _ in range(stage.workers):
+                stage._tasks.append(asyncio.create_task(self._worker(stage)))
+
+    async def run(self, job, stage):
+        """Feed a job into the given stage and wait until it leaves the pipeline"""
+        self._ensure_workers()
+        job.done = asyncio.get_running_loop().create_future()
+        job.stage = stage
+        job.task = None
+        if job.cancelled:
+            return
+        await self.stages[stage].queue.put(job)
+        return await job.done
+
+    def cancel(self, job):
+        """Stop a job wherever it is in the pipeline"""
+        job.cancelled = True
+        if job.task and not job.task.done():
+            job.task.cancel()
+        elif job.done and not job.done.done():
+            # Waiting in a stage queue - the worker drops it when it comes up
+            job.done.set_result(None)
+
+    async def _worker(self, stage):
+        while True:
+            job = await stage.queue.get()
+            if job.cancelled:
+                stage.queue.task_done()
+                continue
+
+            stage.busy += 1
+            job.task = asyncio.create_task(stage.handler(job))
+            try:
+                next_stage = await job.task
+            except asyncio.CancelledError:
+                if not job.cancelled:
+                    raise
+                next_stage = None
+            except Exception as e:
+                next_stage = None
+                if not job.done.done():
+                    job.done.set_exception(e)
+            finally:
+                job.task = None
+                stage.busy -= 1
+                stage.queue.task_done()
+
+            if next_stage:
+                job.stage = next_stage
+                await self.stages[next_stage].queue.put(job)
+            elif not job.done.done():
+                job.done.set_result(None)
+
+    def stats(self):
+        """Waiting and running job counts per stage"""
+        return {
+            name: (stage.queue.qsize(), stage.busy)
+            for name, stage in self.stages.items()
+        }
@@ -0,0 +1,102 @@
+import logging
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+MP4_EXTENSIONS = ['.mp4', '.m4v', '.mov']
+# Containers that can hold libx264 output as-is
+ENCODE_EXTENSIONS = ['.mkv', '.mp4', '.m4v', '.mov']
+
+TEXT_SUBTITLES = ['subrip', 'srt', 'ass', 'ssa', 'webvtt', 'mov_text', 'text']
+MP4_AUDIO = ['aac', 'mp3', 'ac3', 'eac3', 'alac', 'opus', 'flac', 'mp2']
+
+
+class StreamPlan:
+    """How a video job's streams end up in the output file"""
+
+    def __init__(self, ext):
+        self.ext = ext
+        self.encode = True
+        self.reject = None
+        self.exclude = []
+        self.codec_args = ['-c:a', 'copy', '-c:s', 'copy']
+        self.notes = []
+
+    def log(self, name):
+        """Log the corrections made to a file's container and streams"""
+        if self.notes:
+            logger.info(f"Stream plan for {name}: {'; '.join(self.notes)}")
+
+    def map_args(self, input_index=0):
+        """-map arguments keeping every source stream except the excluded ones"""
+        args = ['-map', str(input_index)]
+        for spec in self.exclude:
+            args += ['-map', f'-{input_index}:{spec}']
+        return args
+
+
+def plan_streams(info, source_ext):
+    """Decide output container, stream mapping and subtitle / attachment handling.
+
+    Runs on the probe result before any encode starts, so inputs that would
+    make ffmpeg fail at the muxing step are fixed (or refused) up front
+    instead of after a full libx264 run. An empty probe keeps today's
+    behaviour: same extension, -map 0, everything else copied.
+    """
+    source_ext = source_ext.lower()
+    plan = StreamPlan(source_ext if source_ext in ENCODE_EXTENSIONS else '.mkv')
+    if plan.ext != source_ext:
+        plan.notes.append(f"{source_ext or 'no extension'} cannot hold H.264 output, using .mkv")
+
+    if not info.streams:
+        return plan
+
+    if not info.has_video:
+        plan.encode = False
+        plan.notes.append("no video stream, metadata only")
+        return plan
+
+    if not info.video_codec or info.video_codec == 'none':
+        plan.reject = "The video stream uses an unsupported codec."
+        return plan
+
+    if plan.ext in MP4_EXTENSIONS:
+        bitmap_subs = [c for c in info.subtitle_codecs if c not in TEXT_SUBTITLES]
+        odd_audio = [c for c in info.audio_codecs if c not in MP4_AUDIO]
+        if bitmap_subs or odd_audio:
+            # MP4 cannot carry these - switch to MKV rather than dropping streams
+            plan.ext = '.mkv'
+            plan.notes.append(f"{', '.join(bitmap_subs + odd_audio)} not allowed in MP4, using .mkv")
+        else:
+            if info.subtitles:
+                plan.codec_args = ['-c:a', 'copy', '-c:s', 'mov_text']
+                plan.notes.append("subtitles converted to mov_text")
+            if info.attachments:
+                plan.exclude.append('t')
+                plan.notes.append("attachments dropped (not supported in MP4)")
+
+    if plan.ext == '.mkv':
+        for index, codec in enumerate(info.subtitle_codecs):
+            if codec == 'mov_text':
+                plan.codec_args += [f'-c:s:{index}', 'srt']
+                plan.notes.append(f"mov_text subtitle #{index} converted to SRT")
+        if info.attachments:
+            plan.codec_args += ['-c:t', 'copy']
+
+    if any(s.get("codec_type") == "data" for s in info.streams):
+        plan.exclude.append('d')
+        plan.notes.append("data streams dropped")
+
+    return plan
+
+
+def is_processed(info, marker, legacy_tags=None):
+    """Whether the probe shows one of our own earlier outputs.
+
+    Current outputs carry ``marker`` as their comment tag. Outputs made before
+    the marker existed are recognised by ``legacy_tags`` (all must match).
+    """
+    tags = info.format_tags
+    if marker and tags.get("comment") == marker:
+        return True
+    return bool(legacy_tags) and all(tags.get(key) == value for key, value in legacy_tags.items())
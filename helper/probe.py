@@ -0,0 +1,125 @@
+import asyncio
+import json
+from collections import OrderedDict
+from config import Config
+
+CACHE_SIZE = 512
+_cache = OrderedDict()
+
+
+class MediaInfo:
+    """Structured description of a media file from one ffprobe run"""
+
+    def __init__(self, data=None):
+        data = data or {}
+        fmt = data.get("format", {})
+        self.streams = data.get("streams", [])
+        self.format_name = fmt.get("format_name", "")
+        self.format_tags = {k.lower(): v for k, v in (fmt.get("tags") or {}).items()}
+        self.size = int(fmt.get("size") or 0)
+        try:
+            self.duration = max(0.0, float(fmt.get("duration") or 0))
+        except ValueError:
+            self.duration = 0.0
+
+        self.video = next(
+            (
+                s for s in self.streams
+                if s.get("codec_type") == "video"
+                and not (s.get("disposition") or {}).get("attached_pic")
+            ),
+            None,
+        )
+        self.audio = [s for s in self.streams if s.get("codec_type") == "audio"]
+        self.subtitles = [s for s in self.streams if s.get("codec_type") == "subtitle"]
+        self.attachments = [s for s in self.streams if s.get("codec_type") == "attachment"]
+
+        if not self.duration and self.video:
+            try:
+                self.duration = max(0.0, float(self.video.get("duration") or 0))
+            except ValueError:
+                pass
+
+    @property
+    def has_video(self):
+        return self.video is not None
+
+    @property
+    def width(self):
+        return int(self.video.get("width") or 0) if self.video else 0
+
+    @property
+    def height(self):
+        return int(self.video.get("height") or 0) if self.video else 0
+
+    @property
+    def video_codec(self):
+        return self.video.get("codec_name", "") if self.video else ""
+
+    @property
+    def audio_codecs(self):
+        return [s.get("codec_name", "") for s in self.audio]
+
+    @property
+    def audio_languages(self):
+        languages = []
+        for stream in self.audio:
+            language = (stream.get("tags") or {}).get("language")
+            if language and language != "und" and language not in languages:
+                languages.append(language)
+        return languages
+
+    @property
+    def subtitle_codecs(self):
+        return [s.get("codec_name", "") for s in self.subtitles]
+
+
+async def _ffprobe(source, data=None):
+    """Run ffprobe with JSON output on a path, or on ``data`` piped to stdin"""
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        source,
+        stdin=asyncio.subprocess.PIPE if data is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(process.communicate(input=data), Config.PROBE_TIMEOUT or None)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        raise
+    return json.loads(stdout.decode() or "{}")
+
+
+async def probe_media(path=None, cache_key=None, head=None):
+    """Probe a file (or the first bytes of one) once and cache the result.
+
+    ``cache_key`` is normally the Telegram file_unique_id, so every later
+    step, and any later job for the same file, reuses the same MediaInfo.
+    Returns an empty MediaInfo when ffprobe fails or runs past PROBE_TIMEOUT.
+    """
+    if cache_key and cache_key in _cache:
+        _cache.move_to_end(cache_key)
+        return _cache[cache_key]
+
+    try:
+        if head is not None:
+            data = await _ffprobe("pipe:0", head)
+        else:
+            data = await _ffprobe(path)
+    except Exception:
+        data = {}
+
+    info = MediaInfo(data)
+    # Failed probes, and stream-head probes that could not see the duration, are not cached
+    if cache_key and info.streams and (head is None or info.duration):
+        _cache[cache_key] = info
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return info
@@ -0,0 +1,163 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted to a queue that is at its maximum depth"""
+
+
+class JobQueue:
+    """Bounded job queue that dispatches waiting jobs to a fixed number of slots.
+
+    Jobs are kept in one FIFO per user and dispatched round-robin across users,
+    so a bulk uploader cannot hold every slot while other users wait. A user
+    never has more than ``per_user`` jobs running at once (0 disables the cap).
+    """
+
+    def __init__(self, handler, slots, max_size, policy="reject", per_user=0, on_evict=None, on_move=None):
+        self.handler = handler
+        self.slots = max(1, slots)
+        self.max_size = max(0, max_size)
+        self.policy = policy
+        self.per_user = max(0, per_user)
+        self.on_evict = on_evict
+        self.on_move = on_move
+        self.queues = OrderedDict()
+        self.in_flight = {}
+        self.active = 0
+        self.avg_duration = 300.0
+        self._cond = asyncio.Condition()
+        self._workers = []
+
+    def _ensure_workers(self):
+        """Start the dispatch workers on first use"""
+        if self._workers:
+            return
+        for _ in range(self.slots):
+            self._workers.append(asyncio.create_task(self._worker()))
+
+    async def submit(self, job):
+        """Queue a job and return its waiting position (0 means it starts right away)"""
+        self._ensure_workers()
+        async with self._cond:
+            if self.max_size and len(self) >= self.max_size:
+                if self.policy != "drop_oldest":
+                    raise QueueFull()
+                evicted = min(
+                    (queue[0] for queue in self.queues.values()),
+                    key=lambda waiting: waiting.enqueued_at,
+                )
+                self.remove(evicted)
+                if self.on_evict:
+                    asyncio.create_task(self.on_evict(evicted))
+            job.enqueued_at = time.time()
+            self.queues.setdefault(job.user_id, deque()).append(job)
+            position = self.position(job)
+            self._cond.notify()
+        return position
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def pending(self):
+        """Waiting jobs in the order they are expected to be dispatched"""
+        queues = [list(queue) for queue in self.queues.values()]
+        order = []
+        depth = 0
+        while True:
+            layer = [queue[depth] for queue in queues if depth < len(queue)]
+            if not layer:
+                return order
+            order.extend(layer)
+            depth += 1
+
+    def position(self, job):
+        """1-based position of a waiting job, 0 if it will be picked up immediately"""
+        pending = self.pending
+        try:
+            index = pending.index(job)
+        except ValueError:
+            return 0
+        return self._position_at(pending, index)
+
+    def _position_at(self, pending, index):
+        """Position of ``pending[index]`` given the free slots and the per-user cap"""
+        free = self.slots - self.active
+        position = max(0, index + 1 - free)
+        if not position and self.per_user:
+            # A free slot does not help a user who is already at their limit
+            user_id = pending[index].user_id
+            ahead = sum(1 for waiting in pending[:index] if waiting.user_id == user_id)
+            if self.in_flight.get(user_id, 0) + ahead >= self.per_user:
+                position = 1
+        return position
+
+    def estimated_wait(self, position):
+        """Estimated seconds until a job at the given position starts"""
+        if position <= 0:
+            return 0
+        return math.ceil(position / self.slots) * self.avg_duration
+
+    def remove(self, job):
+        """Drop a waiting job, returns True if it was still queued"""
+        queue = self.queues.get(job.user_id)
+        if not queue:
+            return False
+        try:
+            queue.remove(job)
+        except ValueError:
+            return False
+        if not queue:
+            del self.queues[job.user_id]
+        return True
+
+    def _pop_next(self):
+        """Pick the next job to dispatch, or None when nothing is runnable"""
+        for user_id, queue in self.queues.items():
+            if self.per_user and self.in_flight.get(user_id, 0) >= self.per_user:
+                continue
+            job = queue.popleft()
+            if queue:
+                self.queues.move_to_end(user_id)
+            else:
+                del self.queues[user_id]
+            self.in_flight[user_id] = self.in_flight.get(user_id, 0) + 1
+            return job
+        return None
+
+    async def _worker(self):
+        while True:
+            async with self._cond:
+                job = self._pop_next()
+                while job is None:
+                    await self._cond.wait()
+                    job = self._pop_next()
+                self.active += 1
+            self._notify_moved()
+
+            started = time.time()
+            try:
+                await self.handler(job)
+            except Exception:
+                pass
+            finally:
+                elapsed = time.time() - started
+                self.avg_duration = self.avg_duration * 0.8 + elapsed * 0.2
+                async with self._cond:
+                    self.active -= 1
+                    self.in_flight[job.user_id] -= 1
+                    if not self.in_flight[job.user_id]:
+                        del self.in_flight[job.user_id]
+                    self._cond.notify_all()
+
+    def _notify_moved(self):
+        """Let waiting jobs know their position changed"""
+        if not self.on_move:
+            return
+        pending = self.pending
+        for index, job in enumerate(pending):
+            position = self._position_at(pending, index)
+            asyncio.create_task(self.on_move(job, position, self.estimated_wait(position)))
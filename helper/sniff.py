@@ -0,0 +1,84 @@
+MEDIA = "media"    # container that may or may not hold video - needs a probe
+AUDIO = "audio"
+DATA = "data"      # archives, documents, images, executables
+
+AUDIO_EXTENSIONS = ['.mp3', '.m4a', '.m4b', '.aac', '.flac', '.ogg', '.opus', '.wav', '.wma', '.mka', '.ac3', '.ape']
+
+# offset, magic bytes, kind - checked in order, first match wins
+SIGNATURES = [
+    # Text with a byte order mark (UTF-8, UTF-16 LE / BE) - subtitles, notes
+    (0, b'\xef\xbb\xbf', DATA),
+    (0, b'\xff\xfe', DATA),
+    (0, b'\xfe\xff', DATA),
+    (0, b'PK\x03\x04', DATA),
+    (0, b'PK\x05\x06', DATA),
+    (0, b'%PDF', DATA),
+    (0, b'Rar!\x1a\x07', DATA),
+    (0, b'7z\xbc\xaf\x27\x1c', DATA),
+    (0, b'\x1f\x8b', DATA),
+    (0, b'BZh', DATA),
+    (0, b'\xfd7zXZ\x00', DATA),
+    (0, b'\x89PNG', DATA),
+    (0, b'\xff\xd8\xff', DATA),
+    (0, b'GIF8', DATA),
+    (0, b'MZ', DATA),
+    (0, b'\x7fELF', DATA),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', DATA),
+    (0, b'\x1a\x45\xdf\xa3', MEDIA),
+    (0, b'FLV', MEDIA),
+    (0, b'OggS', MEDIA),
+    (0, b'\x00\x00\x01\xba', MEDIA),
+    (0, b'\x00\x00\x01\xb3', MEDIA),
+    (0, b'\x30\x26\xb2\x75\x8e\x66\xcf\x11', MEDIA),
+    (0, b'ID3', AUDIO),
+    (0, b'fLaC', AUDIO),
+    (0, b'MAC ', AUDIO),
+    (0, b'#!AMR', AUDIO),
+    (0, b'\x0b\x77', AUDIO),
+]
+
+AUDIO_BRANDS = [b'M4A ', b'M4B ', b'M4P ']
+RIFF_KINDS = {b'AVI ': MEDIA, b'WAVE': AUDIO, b'WEBP': DATA}
+
+
+def _audio_frame(head):
+    """Whether the file starts with a valid MPEG audio or ADTS AAC frame header"""
+    if len(head) < 4 or head[0] != 0xff or head[1] & 0xe0 != 0xe0:
+        return False
+    if head[1] & 0xf6 == 0xf0:
+        # ADTS: 12 sync bits, layer 0, sampling frequency index 0-12
+        return (head[2] >> 2) & 0x0f <= 12
+    version = (head[1] >> 3) & 0x03
+    layer = (head[1] >> 1) & 0x03
+    bitrate = head[2] >> 4
+    sample_rate = (head[2] >> 2) & 0x03
+    emphasis = head[3] & 0x03
+    # Reserved version / layer / sample rate, the "bad" bitrate index and reserved emphasis
+    return version != 1 and layer != 0 and bitrate != 15 and sample_rate != 3 and emphasis != 2
+
+
+def sniff(head):
+    """Classify a file from its first bytes, None when nothing matches"""
+    for offset, magic, kind in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return kind
+
+    if head[4:8] == b'ftyp':
+        return AUDIO if head[8:12] in AUDIO_BRANDS else MEDIA
+    if head[:4] == b'RIFF':
+        return RIFF_KINDS.get(head[8:12])
+    # MPEG-TS: sync byte at the start of consecutive 188 byte packets
+    if len(head) > 376 and head[0] == head[188] == head[376] == 0x47:
+        return MEDIA
+    if _audio_frame(head):
+        return AUDIO
+    return None
+
+
+def sniff_file(path, size=512):
+    """Classify a file on disk from its magic bytes"""
+    try:
+        with open(path, 'rb') as f:
+            return sniff(f.read(size))
+    except OSError:
+        return None
@@ -0,0 +1,243 @@
+import asyncio
+import copy
+import json
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+
+class Collection(ABC):
+    """Documents keyed by ``_id`` - the operations ``Database`` needs from a backend.
+
+    ``update`` has the semantics of a Mongo ``$set`` with ``upsert=True``, and
+    ``find`` returns an async iterable in ``_id`` order unless ``sort`` names
+    another field. ``fields`` limits the returned documents to those fields
+    plus ``_id``.
+    """
+
+    @abstractmethod
+    async def get(self, key, fields=None):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def insert(self, document):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update(self, key, values):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, key):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete_many(self, keys):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def count(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def find(self, after=None, sort="_id", fields=None):
+        raise NotImplementedError
+
+
+def _project(document, fields):
+    if fields is None:
+        return document
+    return {key: value for key, value in document.items() if key == "_id" or key in fields}
+
+
+def _sorted(documents, sort):
+    # None sorts first like a missing field does in Mongo
+    return sorted(documents, key=lambda document: (document.get(sort) is not None, document.get(sort)))
+
+
+class MongoCollection(Collection):
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, key, fields=None):
+        projection = {"_id": 1, **{field: 1 for field in fields}} if fields is not None else None
+        return await self.collection.find_one({"_id": key}, projection)
+
+    async def insert(self, document):
+        await self.collection.insert_one(document)
+
+    async def update(self, key, values):
+        await self.collection.update_one({"_id": key}, {"$set": values}, upsert=True)
+
+    async def delete(self, key):
+        await self.collection.delete_one({"_id": key})
+
+    async def delete_many(self, keys):
+        from pymongo import DeleteOne
+        if keys:
+            await self.collection.bulk_write([DeleteOne({"_id": key}) for key in keys], ordered=False)
+
+    async def count(self):
+        return await self.collection.count_documents({})
+
+    def find(self, after=None, sort="_id", fields=None):
+        query = {"_id": {"$gt": after}} if after is not None else {}
+        projection = {"_id": 1, **{field: 1 for field in fields}} if fields is not None else None
+        return self.collection.find(query, projection).sort(sort, 1)
+
+
+class MongoStorage:
+    def __init__(self, uri, database_name):
+        import motor.motor_asyncio
+        self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
+        self.db = self._client[database_name]
+
+    def collection(self, name):
+        return MongoCollection(self.db[name])
+
+
+class MemoryCollection(Collection):
+    """Process-local collection, documents are copied in and out like a real database"""
+
+    def __init__(self):
+        self.documents = {}
+
+    async def get(self, key, fields=None):
+        document = self.documents.get(key)
+        return _project(copy.deepcopy(document), fields) if document is not None else None
+
+    async def insert(self, document):
+        if document["_id"] in self.documents:
+            raise KeyError(f"Duplicate _id {document['_id']!r}")
+        self.documents[document["_id"]] = copy.deepcopy(document)
+
+    async def update(self, key, values):
+        self.documents.setdefault(key, {"_id": key}).update(copy.deepcopy(values))
+
+    async def delete(self, key):
+        self.documents.pop(key, None)
+
+    async def delete_many(self, keys):
+        for key in keys:
+            self.documents.pop(key, None)
+
+    async def count(self):
+        return len(self.documents)
+
+    async def find(self, after=None, sort="_id", fields=None):
+        documents = [document for key, document in self.documents.items() if after is None or key > after]
+        for document in _sorted(documents, sort):
+            yield _project(copy.deepcopy(document), fields)
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.collections = {}
+
+    def collection(self, name):
+        if name not in self.collections:
+            self.collections[name] = MemoryCollection()
+        return self.collections[name]
+
+
+class SQLiteCollection(Collection):
+    """One table per collection holding each document as JSON under its _id"""
+
+    def __init__(self, storage, name):
+        self.storage = storage
+        self.table = f'"{name}"'
+        storage.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id PRIMARY KEY, data TEXT NOT NULL)")
+
+    def _load(self, key):
+        row = self.storage.execute(f"SELECT data FROM {self.table} WHERE id = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _merge(self, key, values):
+        document = self._load(key) or {"_id": key}
+        document.update(values)
+        self.storage.execute(
+            f"INSERT OR REPLACE INTO {self.table} (id, data) VALUES (?, ?)",
+            (key, json.dumps(document))
+        )
+
+    def _select(self, after):
+        if after is None:
+            rows = self.storage.execute(f"SELECT data FROM {self.table} ORDER BY id").fetchall()
+        else:
+            rows = self.storage.execute(f"SELECT data FROM {self.table} WHERE id > ? ORDER BY id", (after,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    async def get(self, key, fields=None):
+        document = await self.storage.run(self._load, key)
+        return _project(document, fields) if document is not None else None
+
+    async def insert(self, document):
+        await self.storage.run(
+            self.storage.execute,
+            f"INSERT INTO {self.table} (id, data) VALUES (?, ?)",
+            (document["_id"], json.dumps(document))
+        )
+
+    async def update(self, key, values):
+        await self.storage.run(self._merge, key, values)
+
+    async def delete(self, key):
+        await self.storage.run(self.storage.execute, f"DELETE FROM {self.table} WHERE id = ?", (key,))
+
+    async def delete_many(self, keys):
+        await self.storage.run(
+            self.storage.executemany,
+            f"DELETE FROM {self.table} WHERE id = ?",
+            [(key,) for key in keys]
+        )
+
+    async def count(self):
+        row = await self.storage.run(lambda: self.storage.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone())
+        return row[0]
+
+    async def find(self, after=None, sort="_id", fields=None):
+        documents = await self.storage.run(self._select, after)
+        if sort != "_id":
+            documents = _sorted(documents, sort)
+        for document in documents:
+            yield _project(document, fields)
+
+
+class SQLiteStorage:
+    """Single-file SQLite database, queries run in a thread so the event loop never blocks"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        self.collections = {}
+
+    def execute(self, sql, params=()):
+        return self._conn.execute(sql, params)
+
+    def executemany(self, sql, params):
+        return self._conn.executemany(sql, params)
+
+    def _locked(self, func, *args):
+        with self._lock:
+            return func(*args)
+
+    async def run(self, func, *args):
+        return await asyncio.to_thread(self._locked, func, *args)
+
+    def collection(self, name):
+        if name not in self.collections:
+            with self._lock:
+                self.collections[name] = SQLiteCollection(self, name)
+        return self.collections[name]
+
+
+def create_storage(backend, uri=None, database_name=None, path=None):
+    """Storage for DB_BACKEND: mongo, sqlite or memory"""
+    if backend == "mongo":
+        return MongoStorage(uri, database_name)
+    if backend == "sqlite":
+        return SQLiteStorage(path)
+    if backend == "memory":
+        return MemoryStorage()
+    raise ValueError(f"Unknown DB_BACKEND {backend!r}, expected mongo, sqlite or memory")
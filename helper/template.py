@@ -0,0 +1,188 @@
+import re
+from collections import OrderedDict
+
+from helper.utils import humanbytes, convert
+
+RENAME = "rename"
+CAPTION = "caption"
+
+CACHE_SIZE = 1024
+_cache = OrderedDict()
+
+# "{{" and "}}" are literal braces, "{name}" a placeholder, any other brace is stray
+TOKEN = re.compile(r"\{\{|\}\}|\{([^{}]*)\}|[{}]")
+
+CODEC_NAMES = {"h264": "H264", "hevc": "HEVC", "av1": "AV1", "vp9": "VP9", "mpeg4": "MPEG4"}
+
+
+class TemplateError(ValueError):
+    """A rename format or caption that cannot be compiled"""
+
+
+def _episode(job):
+    return job.episode or "XX"
+
+
+def _season(job):
+    return (job.season or "1").zfill(2)
+
+
+def _quality(job):
+    return job.quality or "Unknown"
+
+
+def _resolution(job):
+    return f"{job.width}x{job.height}" if job.width and job.height else "Unknown"
+
+
+def _codec(job):
+    return CODEC_NAMES.get(job.video_codec, job.video_codec.upper()) or "Unknown"
+
+
+def _audio(job):
+    return "+".join(language.upper() for language in job.audio_languages) or "Unknown"
+
+
+def _short_duration(job):
+    # No colons - they are not allowed in file names on Windows
+    seconds = int(job.duration)
+    if not seconds:
+        return "Unknown"
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+def _size(job):
+    return humanbytes(job.file_size)
+
+
+def _filename(job):
+    return job.renamed_file_name
+
+
+def _filesize(job):
+    return humanbytes(job.final_file_size)
+
+
+def _duration(job):
+    return convert(int(job.duration))
+
+
+# Placeholders per template kind and how each is read from a RenameJob
+FIELDS = {
+    RENAME: {
+        "episode": _episode,
+        "season": _season,
+        "quality": _quality,
+        "resolution": _resolution,
+        "codec": _codec,
+        "audio": _audio,
+        "duration": _short_duration,
+        "size": _size,
+    },
+    CAPTION: {
+        "filename": _filename,
+        "filesize": _filesize,
+        "duration": _duration,
+        "episode": _episode,
+        "season": _season,
+        "quality": _quality,
+        "resolution": _resolution,
+        "codec": _codec,
+        "audio": _audio,
+    },
+}
+
+# Only known for sure once the file has been probed (documents carry no media metadata)
+PROBE_FIELDS = frozenset({"resolution", "codec", "audio", "duration"})
+
+
+class Template:
+    """A compiled template: one %-format pattern and a getter per placeholder"""
+
+    def __init__(self, text, pattern, getters, fields, errors):
+        self.text = text
+        self.pattern = pattern
+        self.getters = getters
+        self.fields = fields
+        self.errors = errors
+        self.probed = bool(fields & PROBE_FIELDS)
+
+    def render(self, job):
+        return self.pattern % tuple([getter(job) for getter in self.getters])
+
+
+def _compile(kind, text):
+    """Parse a template once. Unknown placeholders and stray braces are kept as
+    literal text and listed in ``errors``, so templates saved before they were
+    validated still render."""
+    fields = FIELDS[kind]
+    pattern = []
+    getters = []
+    used = set()
+    errors = []
+    position = 0
+
+    for match in TOKEN.finditer(text):
+        pattern.append(text[position:match.start()].replace("%", "%%"))
+        position = match.end()
+        token = match.group()
+        if token in ("{{", "}}"):
+            pattern.append(token[0])
+        elif match.group(1) is None:
+            errors.append(f"Unmatched `{token}` - write `{token * 2}` for a literal brace")
+            pattern.append(token)
+        else:
+            name = match.group(1).strip().lower()
+            getter = fields.get(name)
+            if getter is None:
+                errors.append(f"Unknown placeholder `{token}`")
+                pattern.append(token.replace("%", "%%"))
+            else:
+                pattern.append("%s")
+                getters.append(getter)
+                used.add(name)
+    pattern.append(text[position:].replace("%", "%%"))
+
+    return Template(text, "".join(pattern), tuple(getters), frozenset(used), errors)
+
+
+def compile_template(kind, text, strict=False):
+    """Compiled template for ``text``, cached by kind and text.
+
+    With ``strict`` a TemplateError is raised for unknown placeholders and
+    stray braces; that is how formats are validated when they are saved.
+    """
+    key = (kind, text)
+    template = _cache.get(key)
+    if template is None:
+        template = _compile(kind, text)
+        _cache[key] = template
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    else:
+        _cache.move_to_end(key)
+
+    if strict and template.errors:
+        raise TemplateError("\n".join(template.errors))
+    return template
+
+
+PLACEHOLDER_HELP = {
+    "episode": "Episode number",
+    "season": "Season number",
+    "quality": "Video quality (1080p, 720p, 480p, 4K, etc.)",
+    "resolution": "Video size (1920x1080)",
+    "codec": "Video codec (H264, HEVC, ...)",
+    "audio": "Audio languages (JPN+ENG)",
+    "duration": "Duration",
+    "size": "Original file size",
+    "filename": "File name",
+    "filesize": "File size",
+}
+
+
+def placeholder_help(kind):
+    """Bullet list of the placeholders a template kind accepts"""
+    return "\n".join(f"• `{{{name}}}` - {PLACEHOLDER_HELP[name]}" for name in FIELDS[kind])
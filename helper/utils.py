@@ -1,28 +1,44 @@
 import time
 
+PROGRESS_INTERVAL = 5  # seconds between progress edits of one message
+
+# status message object -> time of its last progress edit
+_last_progress = {}
+
+def forget_progress(message):
+    """Drop the throttle state of a status message that is done with transfers"""
+    _last_progress.pop(id(message), None)
+
 async def progress_for_pyrogram(current, total, ud_type, message, start):
     """Enhanced progress tracking with MM:SS format"""
     now = time.time()
     diff = now - start
+
+    key = id(message)
+    if current == total:
+        _last_progress.pop(key, None)
+    elif now - _last_progress.get(key, 0) >= PROGRESS_INTERVAL:
+        _last_progress[key] = now
+    else:
+        return
+
+    percentage = current * 100 / total
+    speed = current / diff if diff > 0 else 0
+    elapsed_time = int(diff)
     
-    if round(diff % 5.00) == 0 or current == total:
-        percentage = current * 100 / total
-        speed = current / diff if diff > 0 else 0
-        elapsed_time = int(diff)
-        
-        if speed > 0:
-            time_to_completion = int((total - current) / speed)
-        else:
-            time_to_completion = 0
+    if speed > 0:
+        time_to_completion = int((total - current) / speed)
+    else:
+        time_to_completion = 0
 
-        elapsed_formatted = format_time(elapsed_time)
-        eta_formatted = format_time(time_to_completion)
-        
-        # Progress bar
-        filled_length = int(20 * current // total)
-        bar = '▰' * filled_length + '▱' * (20 - filled_length)
-        
-        tmp = f"""**{ud_type}**
+    elapsed_formatted = format_time(elapsed_time)
+    eta_formatted = format_time(time_to_completion)
+    
+    # Progress bar
+    filled_length = int(20 * current // total)
+    bar = '▰' * filled_length + '▱' * (20 - filled_length)
+    
+    tmp = f"""**{ud_type}**
 
 {bar}
 
@@ -32,11 +48,11 @@ async def progress_for_pyrogram(current, total, ud_type, message, start):
 **⏱️ Elapsed:** {elapsed_formatted}
 **⏳ ETA:** {eta_formatted}
 """
-        
-        try:
-            await message.edit_text(text=tmp)
-        except Exception:
-            pass
+    
+    try:
+        await message.edit_text(text=tmp)
+    except Exception:
+        pass
 
 def humanbytes(size):
     """Convert bytes to human readable format"""
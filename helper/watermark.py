@@ -0,0 +1,60 @@
+import hashlib
+import os
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_CANDIDATES = [
+    "helper/ZURAMBI.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+]
+CACHE_DIR = "downloads/watermarks"
+
+_font_path = None
+_rendered = {}
+
+
+def find_font():
+    """First available watermark font, looked up once per process"""
+    global _font_path
+    if _font_path is None:
+        _font_path = next((path for path in FONT_CANDIDATES if os.path.exists(path)), "")
+    return _font_path
+
+
+def render_watermark(text, font_path, size, color="white"):
+    """Render the watermark text once to a transparent PNG and return its path.
+
+    drawtext draws at a fixed pixel size whatever the video resolution, so one
+    image per (text, font, size, color) gives the same result at every
+    resolution. The PNG is kept on disk and reused by later jobs.
+    """
+    key = (text, font_path, size, color)
+    path = _rendered.get(key)
+    if path and os.path.exists(path):
+        return path
+
+    digest = hashlib.md5(repr(key).encode()).hexdigest()[:12]
+    path = os.path.join(CACHE_DIR, f"wm_{digest}.png")
+    if not os.path.exists(path):
+        if font_path:
+            font = ImageFont.truetype(font_path, size)
+        else:
+            font = ImageFont.load_default(size)
+
+        # Same box drawtext uses: left edge at x, top of the ascender at y
+        left, top, right, bottom = font.getbbox(text, anchor="la")
+        image = Image.new("RGBA", (max(1, right), max(1, bottom)), (0, 0, 0, 0))
+        ImageDraw.Draw(image).text((0, 0), text, font=font, fill=color, anchor="la")
+
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        image.save(tmp_path, "PNG")
+        os.replace(tmp_path, path)
+
+    _rendered[key] = path
+    return path
+
+
+def watermark_filter(text, size=14, x=3, y=3):
+    """-vf filter that overlays the cached watermark image at (x, y)"""
+    path = render_watermark(text, find_font(), size)
+    return f"movie={path}[wm];[in][wm]overlay={x}:{y}[out]"
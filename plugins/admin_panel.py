@@ -2,7 +2,8 @@ from config import Config, Txt
 from helper.database import ZoroBhaiya
 from pyrogram.types import Message
 from pyrogram import Client, filters
-from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
+from helper.broadcast import Broadcast
+from helper.edits import EDIT_SCHEDULER
 import os, sys, time, asyncio, logging, datetime
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -46,6 +47,11 @@ async def tutorial(bot, message):
 ✅ `{{episode}}` - Episode Number
 ✅ `{{quality}}` - Video Resolution
 ✅ `{{season}}` - Season Number
+✅ `{{resolution}}` - Video Size (1920x1080)
+✅ `{{codec}}` - Video Codec (H264, HEVC)
+✅ `{{audio}}` - Audio Languages (JPN+ENG)
+✅ `{{duration}}` - Duration
+✅ `{{size}}` - File Size
 
 **📝 Example:**
 `/autorename Naruto Shippuden S{{season}}E{{episode}} [{{quality}}] [Dual]`
@@ -77,73 +83,103 @@ async def ping(_, message):
 
 @Client.on_message(filters.command(["stats", "status"]) & filters.user(Config.ADMIN))
 async def get_stats(bot, message):
+    from plugins.file_rename import PIPELINE, TRANSCODE_GOVERNOR
+
     total_users = await ZoroBhaiya.total_users_count()
     start_t = time.time()
     st = await message.reply("**📊 Fetching Statistics...**")
     end_t = time.time()
     time_taken_s = (end_t - start_t) * 1000
+    stages = "\n".join(
+        f"• `{name}`: {running} running, {waiting} waiting"
+        for name, (waiting, running) in PIPELINE.stats().items()
+    )
+    governor = TRANSCODE_GOVERNOR.stats()
     await st.edit(
         text=f"**📊 Bot Statistics**\n\n"
         f"**🌐 Current Ping:** `{time_taken_s:.3f} ms`\n"
         f"**👥 Total Users:** `{total_users}`\n"
-        f"**⚙️ Status:** `Online & Running`"
+        f"**⚙️ Status:** `Online & Running`\n\n"
+        f"**🔄 Pipeline:**\n{stages}\n\n"
+        f"**🖥️ Encoder:** `{governor['running']}` running, `{governor['waiting']}` waiting, "
+        f"`{governor['threads']}/{governor['capacity']}` threads in use ({governor['cores']} cores)"
+    )
+
+# Running broadcast tasks by broadcast id
+broadcasts = {}
+
+def broadcast_text(state, title):
+    """Broadcast progress / result message"""
+    text = f"**{title}**\n\n"
+    if state.get("finished_at"):
+        completed_in = datetime.timedelta(seconds=int(state["finished_at"] - state["started_at"]))
+        text += f"**⏱️ Time Taken:** `{completed_in}`\n"
+    return text + (
+        f"**👥 Total Users:** `{state['total']}`\n"
+        f"**✅ Completed:** `{state['done']} / {state['total']}`\n"
+        f"**🎯 Success:** `{state['success']}`\n"
+        f"**❌ Failed:** `{state['failed']}`\n"
+        f"**🗑️ Removed:** `{state.get('removed', 0)}`"
     )
 
+async def run_broadcast(bot, state, sts_msg):
+    """Run a broadcast to the end, reporting progress in ``sts_msg``"""
+    async def on_progress(engine):
+        EDIT_SCHEDULER.submit(sts_msg, broadcast_text(engine.state, "📢 Broadcast In Progress"))
+
+    engine = Broadcast(
+        bot, ZoroBhaiya, state,
+        Config.BROADCAST_WORKERS, Config.BROADCAST_RATE,
+        on_progress=on_progress,
+    )
+    try:
+        await engine.run()
+        EDIT_SCHEDULER.submit(sts_msg, broadcast_text(state, "✅ Broadcast Completed!"))
+    except Exception as e:
+        logger.error(f"Broadcast error: {e}")
+        EDIT_SCHEDULER.submit(
+            sts_msg,
+            broadcast_text(state, "❌ Broadcast Stopped") + "\n\nIt will resume after the next restart."
+        )
+    finally:
+        broadcasts.pop(state["_id"], None)
+
+def start_broadcast(bot, state, sts_msg):
+    broadcasts[state["_id"]] = asyncio.create_task(run_broadcast(bot, state, sts_msg))
+
 @Client.on_message(filters.command("broadcast") & filters.user(Config.ADMIN) & filters.reply)
 async def broadcast_handler(bot: Client, m: Message):
-    all_users = await ZoroBhaiya.get_all_users()
+    if broadcasts:
+        return await m.reply_text("**⏳ A Broadcast Is Already Running**\n\nWait for it to finish first.")
+
     broadcast_msg = m.reply_to_message
     sts_msg = await m.reply_text("**📢 Broadcast Started!**\n\nProcessing users...")
-    done = 0
-    failed = 0
-    success = 0
-    start_time = time.time()
-    total_users = await ZoroBhaiya.total_users_count()
-    
-    async for user in all_users:
-        sts = await send_msg(user["_id"], broadcast_msg)
-        if sts == 200:
-            success += 1
-        else:
-            failed += 1
-        if sts == 400:
-            await ZoroBhaiya.delete_user(user["_id"])
-        done += 1
-        
-        if not done % 20:
-            try:
-                await sts_msg.edit(
-                    f"**📢 Broadcast In Progress**\n\n"
-                    f"**👥 Total Users:** `{total_users}`\n"
-                    f"**✅ Completed:** `{done} / {total_users}`\n"
-                    f"**🎯 Success:** `{success}`\n"
-                    f"**❌ Failed:** `{failed}`"
-                )
-            except:
-                pass
-    
-    completed_in = datetime.timedelta(seconds=int(time.time() - start_time))
-    await sts_msg.edit(
-        f"**✅ Broadcast Completed!**\n\n"
-        f"**⏱️ Time Taken:** `{completed_in}`\n"
-        f"**👥 Total Users:** `{total_users}`\n"
-        f"**✅ Completed:** `{done} / {total_users}`\n"
-        f"**🎯 Success:** `{success}`\n"
-        f"**❌ Failed:** `{failed}`"
-    )
+    state = {
+        "_id": f"{broadcast_msg.chat.id}:{broadcast_msg.id}",
+        "chat_id": broadcast_msg.chat.id,
+        "message_id": broadcast_msg.id,
+        "admin_chat_id": m.chat.id,
+        "total": await ZoroBhaiya.total_users_count(),
+        "done": 0,
+        "success": 0,
+        "failed": 0,
+        "removed": 0,
+        "last_id": None,
+        "started_at": time.time(),
+    }
+    # Saved before the first send so a restart at any point can resume it
+    await ZoroBhaiya.save_broadcast(state["_id"], state)
+    start_broadcast(bot, state, sts_msg)
 
-async def send_msg(user_id, message):
-    try:
-        await message.copy(chat_id=int(user_id))
-        return 200
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await send_msg(user_id, message)
-    except InputUserDeactivated:
-        return 400
-    except UserIsBlocked:
-        return 400
-    except PeerIdInvalid:
-        return 400
-    except Exception:
-        return 500
+async def resume_broadcasts(bot):
+    """Continue broadcasts that were interrupted by a restart"""
+    for state in await ZoroBhaiya.get_broadcasts():
+        try:
+            sts_msg = await bot.send_message(
+                state["admin_chat_id"],
+                broadcast_text(state, "♻️ Bot Restarted - Resuming Broadcast")
+            )
+        except Exception as e:
+            logger.error(f"Broadcast resume error: {e}")
+            continue
+        start_broadcast(bot, state, sts_msg)
@@ -1,5 +1,6 @@
 from pyrogram import Client, filters
 from helper.database import ZoroBhaiya
+from helper.template import compile_template, placeholder_help, TemplateError, RENAME
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,9 +19,7 @@ async def auto_rename_command(client, message):
                 f"**📝 To Change It:**\n"
                 f"`/autorename [new format]`\n\n"
                 f"**📤 Available Placeholders:**\n"
-                f"• `{{episode}}` - Episode number\n"
-                f"• `{{season}}` - Season number\n"
-                f"• `{{quality}}` - Video quality (1080p, 720p, 480p, 4K, etc.)\n\n"
+                f"{placeholder_help(RENAME)}\n\n"
                 f"**💡 Example:**\n"
                 f"`/autorename S{{season}}E{{episode}} - [{{quality}}]`"
             )
@@ -29,11 +28,10 @@ async def auto_rename_command(client, message):
                 "**🎬 Setup Auto Rename Format**\n\n"
                 "**📝 Usage:** `/autorename [format]`\n\n"
                 "**📤 Available Placeholders:**\n"
-                "• `{episode}` - Episode number\n"
-                "• `{season}` - Season number\n"
-                "• `{quality}` - Video quality (1080p, 720p, 480p, 4K, etc.)\n\n"
+                f"{placeholder_help(RENAME)}\n\n"
                 "**💡 Examples:**\n"
                 "`/autorename Naruto S{season}E{episode} [{quality}]`\n"
+                "`/autorename One Piece {episode} [{resolution} {codec}] [{audio}]`\n"
                 "`/autorename Attack on Titan - {episode} ({quality})`\n"
                 "`/autorename {season}x{episode} - {quality}`\n\n"
                 "**📚 For detailed guide, use:** `/tutorial`"
@@ -48,6 +46,17 @@ async def auto_rename_command(client, message):
             "**Example:** `/autorename S{season}E{episode} [{quality}]`"
         )
 
+    # Parse it once here so every file only renders the compiled format
+    try:
+        compile_template(RENAME, format_template, strict=True)
+    except TemplateError as e:
+        return await message.reply_text(
+            f"**❌ Invalid Format!**\n\n"
+            f"{e}\n\n"
+            f"**📤 Available Placeholders:**\n"
+            f"{placeholder_help(RENAME)}"
+        )
+
     try:
         await ZoroBhaiya.set_format_template(user_id, format_template)
         
@@ -1,114 +1,213 @@
 from pyrogram import Client, filters
 from pyrogram.enums import MessageMediaType
-from pyrogram.types import InputMediaDocument, Message
+from pyrogram.types import InputMediaDocument, Message, CallbackQuery
 from PIL import Image
-from datetime import datetime
-from helper.utils import progress_for_pyrogram, humanbytes, convert, format_time
+from helper.utils import progress_for_pyrogram, humanbytes, format_time
 from helper.database import ZoroBhaiya
+from helper.queue import JobQueue, QueueFull
+from helper.pipeline import Pipeline
+from helper.dashboard import open_status
+from helper.ffmpeg import FFmpegRunner, run_ffmpeg, segmented_encode
+from helper.governor import TranscodeGovernor
+from helper.encode_profile import choose_profile, profile_args
+from helper.watermark import watermark_filter, find_font
+from helper.probe import probe_media
+from helper.planner import plan_streams, is_processed
+from helper.sniff import sniff_file, AUDIO, DATA, AUDIO_EXTENSIONS
+from helper.filename import extract_metadata
+from helper.template import compile_template, placeholder_help, RENAME, CAPTION
 from config import Config
 import os
 import time
-import re
+import hashlib
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.ERROR)
 
-# Queue system
-PROCESSING_SEMAPHORE = asyncio.Semaphore(3)
+# In-flight jobs by output cache key - identical requests attach to the running job
 renaming_operations = {}
+# Jobs a user can still cancel (queued, attached or running) by job_id
+active_jobs = {}
 
-# Metadata extraction patterns
-EPISODE_PATTERNS = [
-    re.compile(r'[\s\-_](\d{3,4})[\s\-_\[]', re.IGNORECASE),
-    re.compile(r'^(\d{3,4})[\s\-_\[]', re.IGNORECASE),
-    re.compile(r'[\]\)][\s\-_]?(\d{3,4})[\s\-_\[]', re.IGNORECASE),
-    re.compile(r'[Ee][Pp]?[\s\-_]?(\d+)', re.IGNORECASE),
-    re.compile(r'[Ee]pisode[\s\-_]?(\d+)', re.IGNORECASE),
-    re.compile(r'S\d+[Ee](\d+)', re.IGNORECASE),
-    re.compile(r'[\-_\s](\d{1,4})[\.\-_\s]*(?:v\d+)?$', re.IGNORECASE),
+WATERMARK_TEXT = "ANIME ATLAS"
+# Written into every output so our own files are recognised and not encoded twice;
+# tied to the watermark so a new watermark still gets burned in
+PROCESSED_MARKER = f"Anime Atlas [{hashlib.md5(WATERMARK_TEXT.encode()).hexdigest()[:8]}]"
+LEGACY_PROCESSED_TAGS = {
+    "title": "Join Anime Atlas on Telegram For More Anime",
+    "artist": "Anime Atlas",
+}
+METADATA_ARGS = [
+    '-metadata', 'title=Join Anime Atlas on Telegram For More Anime',
+    '-metadata', 'artist=Anime Atlas',
+    '-metadata', 'author=Anime Atlas',
+    '-metadata', f'comment={PROCESSED_MARKER}',
 ]
-
-SEASON_PATTERNS = [
-    re.compile(r'[Ss]eason[\s\-_]?(\d+)', re.IGNORECASE),
-    re.compile(r'[Ss](\d+)[Ee]\d+', re.IGNORECASE),
-    re.compile(r'[\s\-_][Ss](\d+)[\s\-_\[]', re.IGNORECASE),
+STREAM_METADATA_ARGS = [
+    '-metadata:s:v', 'title=Join Anime Atlas',
+    '-metadata:s:a', 'title=Anime Atlas',
 ]
 
-QUALITY_PATTERNS = [
-    re.compile(r'\[(\d{3,4}[pP])\]', re.IGNORECASE),
-    re.compile(r'\((\d{3,4}[pP])\)', re.IGNORECASE),
-    re.compile(r'[\s\-_](\d{3,4}[pP])[\s\-_\[]', re.IGNORECASE),
-    re.compile(r'\b(\d{3,4}[pP])\b', re.IGNORECASE),
-    re.compile(r'\b(4[Kk])\b', re.IGNORECASE),
-    re.compile(r'\b(2[Kk])\b', re.IGNORECASE),
-    re.compile(r'\b([Hh][Dd][Rr][Ii][Pp])\b', re.IGNORECASE),
-]
+TRANSCODE_GOVERNOR = TranscodeGovernor(
+    max_jobs=Config.TRANSCODE_MAX_JOBS,
+    threads_per_job=Config.FFMPEG_THREADS,
+    backlog=lambda: PIPELINE.stages["process"].queue.qsize(),
+)
 
-def extract_metadata_fast(filename):
-    """Extract episode, season, quality from filename"""
-    name_only = os.path.splitext(filename)[0]
-    
-    episode = None
-    season = None
-    quality = None
-    
-    for pattern in EPISODE_PATTERNS:
-        match = pattern.search(name_only)
-        if match:
-            episode = match.group(1)
-            break
-    
-    for pattern in SEASON_PATTERNS:
-        match = pattern.search(name_only)
-        if match:
-            season = match.group(1)
-            break
-    
-    for pattern in QUALITY_PATTERNS:
-        match = pattern.search(name_only)
-        if match:
-            quality = match.group(1)
-            if quality.lower() in ['4k', '2k']:
-                quality = quality.upper()
-            elif 'p' in quality.lower():
-                quality = quality.lower()
-            elif 'hdrip' in quality.lower():
-                quality = 'HDRIP'
-            break
-    
-    if not season:
-        season = '1'
-    if not quality:
-        quality = 'Unknown'
-    
-    return episode, season, quality
+# Changes whenever the watermark or metadata change, so cached outputs made
+# with older settings are not re-sent
+SETTINGS_VERSION = hashlib.md5(
+    repr((WATERMARK_TEXT, METADATA_ARGS, STREAM_METADATA_ARGS)).encode()
+).hexdigest()[:8]
 
-def apply_rename_template(template, episode, season, quality):
-    """Apply rename template with placeholders"""
-    result = template
-    
-    if '{episode}' in result:
-        result = result.replace('{episode}', episode if episode else 'XX')
-    
-    if '{season}' in result:
-        result = result.replace('{season}', season.zfill(2))
-    
-    if '{quality}' in result:
-        result = result.replace('{quality}', quality)
-    
-    return result
+def rename_job(job):
+    """Render the user's rename format into the job's output file name"""
+    template = compile_template(RENAME, job.format_template)
+    job.renamed_file_name = f"{template.render(job)}{job.file_extension}"
+
+def read_media_info(job, info):
+    """Take duration, size, codec and audio languages from a probe"""
+    job.duration = info.duration or job.duration
+    job.width = info.width or job.width
+    job.height = info.height or job.height
+    job.video_codec = info.video_codec or job.video_codec
+    job.audio_languages = info.audio_languages or job.audio_languages
+
+# Containers ffmpeg can read front to back from a pipe
+STREAMABLE_EXTENSIONS = ['.mkv', '.webm', '.ts', '.flv', '.mpg', '.mpeg']
+STREAM_PROBE_BYTES = 4 * 1024 * 1024
 
 def is_video_file(file_path):
     """Check if file is video by extension"""
-    video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv', '.m4v', '.wmv', '.mpg', '.mpeg']
+    video_extensions = ['.mp4', '.mkv', '.avi', '.mov', '.webm', '.flv', '.m4v', '.wmv', '.mpg', '.mpeg', '.ts']
     ext = os.path.splitext(file_path)[1].lower()
     return ext in video_extensions
 
+class RenameJob:
+    """A file waiting for or going through processing"""
+
+    def __init__(self, client, message):
+        self.client = client
+        self.message = message
+        self.user_id = message.from_user.id
+        self.status_msg = None
+        self.position = 0
+        self.enqueued_at = time.time()
+        self.stage = None
+        self.done = None
+        self.file_id = None
+        self.file_unique_id = None
+        self.cache_key = None
+        self.file_name = None
+        self.file_size = 0
+        self.file_extension = ""
+        self.media_type = None
+        self.duration = 0
+        self.width = 0
+        self.height = 0
+        self.media_info = None
+        self.video_codec = ""
+        self.audio_languages = []
+        self.format_template = None
+        self.episode = None
+        self.season = None
+        self.quality = None
+        self.renamed_file_name = None
+        self.download_path = None
+        self.output_path = None
+        self.thumb_path = None
+        self.is_video = False
+        self.streaming = False
+        self.final_file_size = 0
+        self.job_id = f"{message.chat.id}:{message.id}"
+        self.resume_stage = None
+        self.interrupted = False
+        self.attached = False
+        self.followers = []
+        self.output_file_id = None
+        self.task = None
+        self.cancelled = False
+
+    # Fields written to the job journal so a restart can resume the job
+    JOURNAL_FIELDS = (
+        "file_id", "file_unique_id", "cache_key", "file_name", "file_size", "file_extension", "media_type", "duration", "width", "height",
+        "video_codec", "audio_languages", "format_template", "episode", "season", "quality", "renamed_file_name", "download_path", "output_path", "is_video", "final_file_size",
+    )
+
+    def snapshot(self):
+        return {field: getattr(self, field) for field in self.JOURNAL_FIELDS}
+
+    def restore(self, data):
+        for field in self.JOURNAL_FIELDS:
+            if field in data:
+                setattr(self, field, data[field])
+
+async def journal(job, stage, **extra):
+    """Record the last completed stage of a job"""
+    data = job.snapshot()
+    data.update(extra)
+    data["stage"] = stage
+    try:
+        await ZoroBhaiya.save_job(job.job_id, data)
+    except Exception as e:
+        logger.error(f"Job journal error: {e}")
+
+def queue_status_text(position, wait):
+    """Queue position message shown while a file waits for a slot"""
+    return (
+        f"**⏳ Added To Queue**\n\n"
+        f"**📍 Position:** `#{position}`\n"
+        f"**⏱️ Estimated Wait:** `{format_time(wait)}`\n\n"
+        f"Your file will start processing automatically."
+    )
+
+async def run_job(job):
+    """Queue handler - process a dispatched job"""
+    await start_processing(job)
+
+async def on_job_moved(job, position, wait):
+    """Refresh the queue message when a waiting job moves up"""
+    # Position 0 means it is about to start, the download message follows
+    if not position or position == job.position or not job.status_msg:
+        return
+    job.position = position
+    try:
+        await job.status_msg.edit_text(queue_status_text(position, wait))
+    except Exception:
+        pass
+
+async def on_job_evicted(job):
+    """Tell the user their waiting file was dropped to make room, then release the job"""
+    try:
+        text = (
+            "**❌ Removed From Queue**\n\n"
+            "The queue overflowed and your file was dropped.\n"
+            "Please send it again in a few minutes."
+        )
+        if job.status_msg:
+            await job.status_msg.edit_text(text)
+        else:
+            await job.message.reply_text(text)
+    except Exception:
+        pass
+    # Same cleanup as a finished job: no resume after a restart, no live dashboard entry
+    await finish_job(job)
+
+JOB_QUEUE = JobQueue(
+    run_job,
+    Config.MAX_CONCURRENT_JOBS,
+    Config.MAX_QUEUE_SIZE,
+    Config.QUEUE_FULL_POLICY,
+    per_user=Config.MAX_JOBS_PER_USER,
+    on_evict=on_job_evicted,
+    on_move=on_job_moved,
+)
+
 @Client.on_message(filters.private & (filters.document | filters.video | filters.audio))
 async def auto_rename_files(client, message):
-    """Main handler for incoming files - Direct processing without queue"""
+    """Main handler for incoming files - Adds them to the processing queue"""
     
     user_id = message.from_user.id
     
@@ -124,360 +223,888 @@ async def auto_rename_files(client, message):
             "**📌 Example:**\n"
             "`/autorename [@Anime_Atlas] {episode} - One Piece [{quality}] [Sub]`\n\n"
             "**📤 Available Placeholders:**\n"
-            "• `{episode}` - Episode number\n"
-            "• `{season}` - Season number\n"
-            "• `{quality}` - Video quality\n\n"
+            f"{placeholder_help(RENAME)}\n\n"
             "**💡 Tip:** Use /tutorial for detailed guide!"
         )
 
-    # Check semaphore availability
-    if PROCESSING_SEMAPHORE.locked() and PROCESSING_SEMAPHORE._value == 0:
+    job = RenameJob(client, message)
+    await journal(
+        job, "queued",
+        user_id=user_id, chat_id=message.chat.id, message_id=message.id, created_at=time.time(),
+    )
+    active_jobs[job.job_id] = job
+    try:
+        position = await JOB_QUEUE.submit(job)
+    except QueueFull:
+        active_jobs.pop(job.job_id, None)
+        await ZoroBhaiya.delete_job(job.job_id)
         return await message.reply_text(
             f"**⏳ Processing Queue Full**\n\n"
-            f"**🔄 Currently Processing:** 3 files\n"
-            f"**⚙️ Status:** All slots occupied\n\n"
-            f"Please wait a moment and try again!"
+            f"**📋 Waiting Files:** {len(JOB_QUEUE)}\n"
+            f"**⚙️ Status:** Queue limit reached\n\n"
+            f"Please wait a few minutes and send the file again!"
         )
-    
-    # Process directly with semaphore
-    asyncio.create_task(start_processing(client, message))
 
-async def get_video_duration(file_path):
-    """Get video duration using ffprobe"""
+    if position > 0:
+        job.position = position
+        try:
+            job.status_msg = await open_status(
+                job, queue_status_text(position, JOB_QUEUE.estimated_wait(position))
+            )
+        except Exception:
+            pass
+
+def ffmpeg_progress_text(progress, duration, operation):
+    """Progress message for an FFmpeg run with MM:SS format"""
+    seconds_done = progress.out_time
+    lines = [f"**⚙️ {operation}**\n"]
+
+    if duration > 0:
+        percentage = min(int((seconds_done / duration) * 100), 100)
+        filled = int((percentage / 100) * 20)
+        bar = '▰' * filled + '▱' * (20 - filled)
+        lines += [
+            f"{bar}\n",
+            f"**📊 Progress:** {percentage}%",
+            f"**⏱️ Time:** {format_time(seconds_done)} / {format_time(duration)}",
+        ]
+    else:
+        lines.append(f"**⏱️ Time:** {format_time(seconds_done)}")
+
+    if progress.speed > 0:
+        fps = f"{progress.fps:.0f} fps, " if progress.fps > 0 else ""
+        lines.append(f"**🚀 Speed:** {fps}{progress.speed:.2f}x")
+        if duration > seconds_done:
+            lines.append(f"**⏳ ETA:** {format_time((duration - seconds_done) / progress.speed)}")
+
+    return "\n".join(lines)
+
+def ffmpeg_progress(status_msg, duration, operation="Processing"):
+    """FFmpegRunner progress callback, edits the status message at most every 3 seconds"""
+    last_update = 0
+
+    async def on_progress(progress):
+        nonlocal last_update
+        current_time = time.time()
+        if current_time - last_update > 3:
+            last_update = current_time
+            try:
+                await status_msg.edit_text(
+                    ffmpeg_progress_text(progress, duration, operation)
+                )
+            except Exception:
+                pass
+
+    return on_progress
+
+async def start_processing(job):
+    """Main processing function - runs a job through download, process and upload"""
+    try:
+        await PIPELINE.run(job, job.resume_stage or "download")
+    except asyncio.CancelledError:
+        # Shutting down - keep the journal entry and files so the job resumes
+        job.interrupted = True
+        raise
+    except Exception as e:
+        if job.status_msg:
+            try:
+                error_msg = str(e)
+                if len(error_msg) > 150:
+                    error_msg = error_msg[:150] + "..."
+                await job.status_msg.edit_text(
+                    f"**❌ An Error Occurred**\n\n"
+                    f"Error: {error_msg}\n\n"
+                    f"Please try again or contact @Sanji_Fr"
+                )
+            except:
+                pass
+    finally:
+        if not job.interrupted:
+            await finish_job(job)
+
+async def finish_job(job):
+    """Release what a finished, failed or cancelled job holds: followers, journal entry and files"""
+    if job.cache_key and renaming_operations.get(job.cache_key) is job:
+        del renaming_operations[job.cache_key]
+        for follower in job.followers:
+            asyncio.create_task(finish_follower(job, follower))
+
+    if job.attached:
+        return
+
+    active_jobs.pop(job.job_id, None)
+    if job.status_msg:
+        await job.status_msg.close()
+
+    try:
+        await ZoroBhaiya.delete_job(job.job_id)
+    except Exception:
+        pass
+
+    for path in [job.download_path, job.output_path, job.thumb_path]:
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except:
+                pass
+
+async def cancel_job(job):
+    """Abort a job wherever it is - waiting in the queue, attached to another job or running"""
+    if job.cancelled:
+        return False
+
+    if JOB_QUEUE.remove(job):
+        job.cancelled = True
+        await finish_job(job)
+    elif job.attached:
+        job.cancelled = True
+        leader = renaming_operations.get(job.cache_key)
+        if leader and job in leader.followers:
+            leader.followers.remove(job)
+        job.attached = False
+        await finish_job(job)
+    else:
+        # The stage task is cancelled: downloads and uploads stop, ffmpeg is killed
+        # and start_processing cleans up as for any finished job
+        PIPELINE.cancel(job)
+
+    text = "**🚫 Cancelled**\n\nThe file was removed from processing."
     try:
-        process = await asyncio.create_subprocess_exec(
-            "ffprobe", "-v", "error", "-show_entries", 
-            "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", 
-            file_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        if job.status_msg:
+            await job.status_msg.edit_text(text)
+        else:
+            await job.message.reply_text(text)
+    except Exception:
+        pass
+    return True
+
+def user_jobs(user_id):
+    return [job for job in active_jobs.values() if job.user_id == user_id]
+
+@Client.on_message(filters.private & filters.command("cancel"))
+async def cancel_command(client, message):
+    """Cancel the replied-to file, or every file of the user"""
+    user_id = message.from_user.id
+    jobs = user_jobs(user_id)
+
+    reply = message.reply_to_message
+    if reply:
+        jobs = [
+            job for job in jobs
+            if job.message.id == reply.id or (job.status_msg and job.status_msg.id == reply.id)
+        ]
+
+    if not jobs:
+        return await message.reply_text("**❌ Nothing To Cancel**\n\nNone of your files are being processed.")
+
+    cancelled = 0
+    for job in jobs:
+        if await cancel_job(job):
+            cancelled += 1
+    await message.reply_text(f"**🚫 Cancelled {cancelled} File(s)**")
+
+@Client.on_callback_query(filters.regex(r"^cancel:"), group=-1)
+async def cancel_button(client, query: CallbackQuery):
+    """Cancel button on a job's status message"""
+    job = active_jobs.get(query.data.split(":", 1)[1])
+    if not job:
+        await query.answer("This file is no longer being processed.", show_alert=True)
+    elif job.user_id != query.from_user.id and query.from_user.id not in Config.ADMIN:
+        await query.answer("This is not your file.", show_alert=True)
+    elif await cancel_job(job):
+        await query.answer("Cancelled")
+    else:
+        await query.answer("Already cancelled.")
+    # The catch-all callback handler must not see this query
+    query.stop_propagation()
+
+async def prepare_job(job):
+    """Resolve user settings, file info and the renamed file name"""
+    message = job.message
+
+    try:
+        settings = await ZoroBhaiya.get_user_settings(job.user_id)
+    except Exception:
+        settings = {}
+    format_template = settings.get("format_template")
+
+    if not format_template or not format_template.strip():
+        await message.reply_text(
+            "**❌ Error:** Format template not found.\n"
+            "Please set it again with `/autorename`"
         )
-        stdout, _ = await process.communicate()
-        duration = float(stdout.decode().strip())
-        return duration if duration > 0 else 0
+        return False
+
+    media_preference = settings.get("media_preference")
+
+    # Get file info
+    if message.document:
+        job.file_unique_id = message.document.file_unique_id
+        job.file_id = message.document.file_id
+        job.file_name = message.document.file_name
+        job.file_size = message.document.file_size
+        job.media_type = media_preference or "document"
+        job.duration = 0
+    elif message.video:
+        job.file_unique_id = message.video.file_unique_id
+        job.file_id = message.video.file_id
+        job.file_name = message.video.file_name or f"video_{int(time.time())}.mp4"
+        job.file_size = message.video.file_size
+        job.media_type = media_preference or "video"
+        job.duration = message.video.duration or 0
+        job.width = message.video.width or 0
+        job.height = message.video.height or 0
+    elif message.audio:
+        job.file_unique_id = message.audio.file_unique_id
+        job.file_id = message.audio.file_id
+        job.file_name = message.audio.file_name or f"audio_{int(time.time())}.mp3"
+        job.file_size = message.audio.file_size
+        job.media_type = media_preference or "audio"
+        job.duration = message.audio.duration or 0
+    else:
+        return False
+
+    # Extract metadata and apply template - placeholders that need a probe are
+    # filled from Telegram's metadata for now and rendered again once it ran
+    job.episode, job.season, job.quality = extract_metadata(job.file_name)
+    job.format_template = format_template
+    _, job.file_extension = os.path.splitext(job.file_name)
+    rename_job(job)
+
+    thumbnail = settings.get("thumbnail")
+    job.cache_key = output_cache_key(job, thumbnail)
+
+    leader = renaming_operations.get(job.cache_key)
+    if leader:
+        # Same chat sending the same file again is a duplicate - ignore it
+        if leader.message.chat.id != message.chat.id:
+            await attach_follower(leader, job)
+        elif job.status_msg:
+            # Closed as a final entry, so it must not keep the queue text
+            await job.status_msg.edit_text(
+                "**⚠️ Duplicate skipped**\n\nThis file is already being processed."
+            )
+        return False
+
+    renaming_operations[job.cache_key] = job
+
+    os.makedirs("downloads", exist_ok=True)
+
+    timestamp = int(time.time())
+    job.download_path = f"downloads/{timestamp}_{id(job)}_{job.file_name}"
+    job.output_path = f"downloads/output_{timestamp}_{id(job)}{job.file_extension}"
+    return True
+
+def output_cache_key(job, thumbnail):
+    """Cache key for the uploaded output of a job"""
+    parts = [
+        job.file_unique_id, job.renamed_file_name, job.media_type,
+        thumbnail or "", SETTINGS_VERSION,
+    ]
+    return hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+
+def build_caption(job, c_caption):
+    """Render the user's caption (or the default one) for the output file"""
+    return (
+        compile_template(CAPTION, c_caption).render(job)
+        if c_caption
+        else f"**📁 {job.renamed_file_name}**\n\n📦 Size: {humanbytes(job.final_file_size)}"
+    )
+
+async def send_cached_output(job):
+    """Re-send an identical earlier output by file_id, returns True on a cache hit"""
+    if not Config.OUTPUT_CACHE:
+        return False
+
+    try:
+        cached = await ZoroBhaiya.get_cached_output(job.cache_key)
     except Exception:
-        return 0
+        cached = None
+    if not cached:
+        return False
 
-async def monitor_ffmpeg_progress(process, status_msg, duration, operation="Processing"):
-    """Monitor FFmpeg progress with MM:SS format"""
-    last_update = 0
-    
-    while True:
-        line = await process.stderr.readline()
-        if not line:
+    job.final_file_size = cached.get("file_size", 0)
+    job.duration = cached.get("duration", job.duration)
+    # The name the output was uploaded under, with its probe placeholders filled
+    job.renamed_file_name = cached.get("file_name", job.renamed_file_name)
+    job.width = cached.get("width", job.width)
+    job.height = cached.get("height", job.height)
+    job.video_codec = cached.get("video_codec", job.video_codec)
+    job.audio_languages = cached.get("audio_languages", job.audio_languages)
+
+    try:
+        await send_output(job, cached["file_id"])
+    except Exception as e:
+        logger.error(f"Cached output resend failed: {e}")
+        await ZoroBhaiya.delete_cached_output(job.cache_key)
+        return False
+    return True
+
+async def send_output(job, file_id):
+    """Send an already uploaded output to the job's chat with its own caption"""
+    c_caption = await ZoroBhaiya.get_caption(job.message.chat.id)
+    await job.client.send_cached_media(
+        job.message.chat.id,
+        file_id,
+        caption=build_caption(job, c_caption),
+    )
+
+    if job.status_msg:
+        try:
+            await job.status_msg.delete()
+        except:
+            pass
+
+async def attach_follower(leader, job):
+    """Let a job wait for an identical job that is already running"""
+    job.attached = True
+    leader.followers.append(job)
+    text = (
+        "**🔗 Already Processing**\n\n"
+        "The same file is being processed right now.\n"
+        "You will receive it as soon as it is done."
+    )
+    try:
+        if job.status_msg:
+            await job.status_msg.edit_text(text)
+        else:
+            job.status_msg = await open_status(job, text)
+    except Exception:
+        pass
+
+async def finish_follower(leader, job):
+    """Hand the leader's output to an attached job, or run it itself if the leader failed"""
+    job.attached = False
+    if leader.output_file_id:
+        job.final_file_size = leader.final_file_size
+        job.duration = leader.duration
+        job.renamed_file_name = leader.renamed_file_name
+        job.width = leader.width
+        job.height = leader.height
+        job.video_codec = leader.video_codec
+        job.audio_languages = leader.audio_languages
+        try:
+            await send_output(job, leader.output_file_id)
+            await ZoroBhaiya.delete_job(job.job_id)
+            active_jobs.pop(job.job_id, None)
+            return
+        except Exception as e:
+            logger.error(f"Coalesced output send failed: {e}")
+
+    try:
+        await JOB_QUEUE.submit(job)
+    except QueueFull:
+        active_jobs.pop(job.job_id, None)
+        await ZoroBhaiya.delete_job(job.job_id)
+        await queue_full_status(job)
+
+async def queue_full_status(job):
+    """Tell the user a job could not be put back in the queue"""
+    text = (
+        "**⏳ Processing Queue Full**\n\n"
+        "Please send the file again in a few minutes!"
+    )
+    try:
+        if job.status_msg:
+            await job.status_msg.edit_text(text)
+            await job.status_msg.close()
+        else:
+            await job.message.reply_text(text)
+    except Exception:
+        pass
+
+def can_stream(job):
+    """Whether the source can be piped into ffmpeg while it downloads"""
+    if not Config.STREAMING_INGEST or not is_video_file(job.file_name):
+        return False
+    # MP4/MOV style containers may keep their index at the end and need seeking
+    if job.file_extension.lower() not in STREAMABLE_EXTENSIONS:
+        return False
+    # Segmented encodes split the file on disk
+    if Config.SEGMENT_ENCODING and (not job.duration or job.duration >= Config.SEGMENT_MIN_DURATION):
+        return False
+    return True
+
+async def read_stream_head(chunks, size=STREAM_PROBE_BYTES):
+    """Read the first bytes of a Telegram stream so they can be probed before encoding"""
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= size:
             break
-        
-        line_str = line.decode('utf-8', errors='ignore').strip()
-        
-        if "time=" in line_str and duration > 0:
-            current_time = time.time()
-            if current_time - last_update > 3:
-                try:
-                    time_match = re.search(r'time=(\d{2}):(\d{2}):(\d{2})', line_str)
-                    if time_match:
-                        h, m, s = map(int, time_match.groups())
-                        seconds_done = h*3600 + m*60 + s
-                        percentage = min(int((seconds_done / duration) * 100), 100)
-                        
-                        filled = int((percentage / 100) * 20)
-                        bar = '▰' * filled + '▱' * (20 - filled)
-                        
-                        time_done = format_time(seconds_done)
-                        time_total = format_time(duration)
-                        
-                        await status_msg.edit_text(
-                            f"**⚙️ {operation}**\n\n"
-                            f"{bar}\n\n"
-                            f"**📊 Progress:** {percentage}%\n"
-                            f"**⏱️ Time:** {time_done} / {time_total}"
-                        )
-                        last_update = current_time
-                except Exception:
-                    pass
-
-async def start_processing(client, message):
-    """Main processing function"""
-    async with PROCESSING_SEMAPHORE:
-        user_id = message.from_user.id
-        download_path = None
-        output_path = None
-        thumb_path = None
-        status_msg = None
-        
+    return head
+
+async def feed_ffmpeg(job, process, head, chunks):
+    """Pipe the Telegram download straight into ffmpeg's stdin, returns bytes sent"""
+    sent = 0
+    try:
+        process.stdin.write(head)
+        await process.stdin.drain()
+        sent += len(head)
+        async for chunk in chunks:
+            process.stdin.write(chunk)
+            await process.stdin.drain()
+            sent += len(chunk)
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
         try:
-            # Get user settings
-            try:
-                format_template = await ZoroBhaiya.get_format_template(user_id)
-            except Exception:
-                format_template = None
-            
-            if not format_template or not format_template.strip():
-                return await message.reply_text(
-                    "**❌ Error:** Format template not found.\n"
-                    "Please set it again with `/autorename`"
-                )
-            
-            media_preference = await ZoroBhaiya.get_media_preference(user_id)
-
-            # Get file info
-            if message.document:
-                file_id = message.document.file_id
-                file_name = message.document.file_name
-                file_size = message.document.file_size
-                media_type = media_preference or "document"
-                duration = 0
-            elif message.video:
-                file_id = message.video.file_id
-                file_name = message.video.file_name or f"video_{int(time.time())}.mp4"
-                file_size = message.video.file_size
-                media_type = media_preference or "video"
-                duration = message.video.duration or 0
-            elif message.audio:
-                file_id = message.audio.file_id
-                file_name = message.audio.file_name or f"audio_{int(time.time())}.mp3"
-                file_size = message.audio.file_size
-                media_type = media_preference or "audio"
-                duration = message.audio.duration or 0
+            process.stdin.close()
+            await chunks.aclose()
+        except Exception:
+            pass
+    return sent
+
+async def download_stage(job):
+    """STEP 1: Download the source file"""
+    # Jobs sent back here after a failed streaming encode are already prepared
+    if not job.download_path:
+        if not await prepare_job(job):
+            return None
+
+        if await send_cached_output(job):
+            return None
+
+        if can_stream(job):
+            job.streaming = True
+            text = "**📥 Streaming your file into the encoder...**\n\nPlease wait..."
+            if job.status_msg:
+                await job.status_msg.edit_text(text)
             else:
-                return
-
-            if file_id in renaming_operations:
-                return
-
-            renaming_operations[file_id] = datetime.now()
-
-            # Extract metadata and apply template
-            episode, season, quality = extract_metadata_fast(file_name)
-            renamed_template = apply_rename_template(format_template, episode, season, quality)
-            _, file_extension = os.path.splitext(file_name)
-            renamed_file_name = f"{renamed_template}{file_extension}"
-            
-            os.makedirs("downloads", exist_ok=True)
-            
-            timestamp = int(time.time())
-            download_path = f"downloads/{timestamp}_{file_name}"
-            output_path = f"downloads/output_{timestamp}{file_extension}"
-            
-            # STEP 1: DOWNLOAD
-            status_msg = await message.reply_text("**📥 Downloading your file...**\n\nPlease wait...")
-
-            download_start = time.time()
-            await client.download_media(
-                message,
-                file_name=download_path,
-                progress=progress_for_pyrogram,
-                progress_args=("**📥 Downloading...**", status_msg, download_start),
+                job.status_msg = await open_status(job, text)
+            return "process"
+
+    if job.status_msg:
+        await job.status_msg.edit_text("**📥 Downloading your file...**\n\nPlease wait...")
+    else:
+        job.status_msg = await open_status(job, "**📥 Downloading your file...**\n\nPlease wait...")
+
+    download_start = time.time()
+    await job.client.download_media(
+        job.message,
+        file_name=job.download_path,
+        progress=progress_for_pyrogram,
+        progress_args=("**📥 Downloading...**", job.status_msg, download_start),
+    )
+
+    if not os.path.exists(job.download_path):
+        await job.status_msg.edit_text("**❌ Download Failed**\n\nFile not found after download.")
+        return None
+
+    await journal(job, "downloaded")
+
+    process = PIPELINE.stages["process"]
+    if process.busy >= process.workers:
+        await job.status_msg.edit_text("**⏳ Downloaded - Waiting For A Free Encoder...**")
+    return "process"
+
+async def route_file(job):
+    """Cheapest handler for a downloaded file: "video", "remux" or "rename".
+
+    Magic bytes settle archives, documents, images and plain audio without
+    starting a process. Only possible media files are probed, and the
+    probe is cached for process_stage.
+    """
+    kind = sniff_file(job.download_path)
+    if kind == DATA:
+        return "rename"
+    if kind == AUDIO:
+        return "remux"
+
+    ext = os.path.splitext(job.download_path)[1].lower()
+    if kind is None and not is_video_file(job.download_path) and ext not in AUDIO_EXTENSIONS:
+        return "rename"
+
+    info = await probe_media(job.download_path, job.file_unique_id)
+    job.media_info = info
+    if info.streams:
+        return "video" if info.has_video else "remux"
+    # ffprobe could not read it - go by the extension as before
+    return "video" if is_video_file(job.download_path) else "remux"
+
+def backlog_depth():
+    """Files waiting to be downloaded or encoded"""
+    return (
+        len(JOB_QUEUE)
+        + PIPELINE.stages["download"].queue.qsize()
+        + PIPELINE.stages["process"].queue.qsize()
+    )
+
+async def process_stage(job):
+    """STEP 2: Watermark / metadata processing"""
+    status_msg = job.status_msg
+    download_path = job.download_path
+    output_path = job.output_path
+    # Streaming only starts for video extensions, so there is nothing to sniff
+    route = "video" if job.streaming else await route_file(job)
+    job.is_video = route == "video"
+    remux_only = False
+
+    if job.is_video:
+        if job.streaming:
+            chunks = job.client.stream_media(job.message)
+            head = await read_stream_head(chunks)
+            job.media_info = await probe_media(cache_key=job.file_unique_id, head=head)
+        else:
+            job.media_info = await probe_media(download_path, job.file_unique_id)
+
+        info = job.media_info
+        read_media_info(job, info)
+
+        # Fix or refuse container / stream problems before spending CPU on an encode
+        plan = plan_streams(info, job.file_extension)
+        plan.log(job.file_name)
+        # Our own earlier output: the watermark is already burned in, only remux
+        remux_only = plan.encode and not plan.reject and is_processed(
+            info, PROCESSED_MARKER, LEGACY_PROCESSED_TAGS
+        )
+        if plan.reject or not plan.encode or remux_only:
+            if job.streaming:
+                await chunks.aclose()
+                job.streaming = False
+            if plan.reject:
+                await status_msg.edit_text(f"**❌ Unsupported File**\n\n{plan.reject}")
+                return None
+            if not remux_only:
+                job.is_video = False
+            if not download_path or not os.path.exists(download_path):
+                return "download"
+        elif plan.ext != job.file_extension.lower():
+            stem = len(job.file_extension)
+            job.renamed_file_name = job.renamed_file_name[:len(job.renamed_file_name) - stem] + plan.ext
+            job.output_path = job.output_path[:len(job.output_path) - stem] + plan.ext
+            job.file_extension = plan.ext
+            output_path = job.output_path
+
+    if job.is_video and not remux_only:
+        # The encode below is always libx264
+        job.video_codec = "h264"
+
+    if job.format_template and compile_template(RENAME, job.format_template).probed:
+        if route == "remux":
+            # Plain audio is sniffed, not probed, on the way here
+            read_media_info(job, job.media_info or await probe_media(download_path, job.file_unique_id))
+        rename_job(job)
+
+    if job.is_video and not remux_only:
+        await status_msg.edit_text("**⚙️ Processing metadata and watermark...**\n\nThis may take a moment...")
+
+        try:
+            video_filter = watermark_filter(WATERMARK_TEXT)
+        except Exception as e:
+            logger.error(f"Watermark render error: {e}")
+            video_filter = (
+                f"drawtext=text='{WATERMARK_TEXT}':"
+                f"fontfile={find_font() or 'Arial'}:"
+                f"fontsize=14:"
+                f"fontcolor=white:"
+                f"x=3:"
+                f"y=3"
             )
-            
-            if not os.path.exists(download_path):
-                return await status_msg.edit_text("**❌ Download Failed**\n\nFile not found after download.")
-
-            # STEP 2: PROCESSING
-            is_video = is_video_file(download_path)
-            
-            if is_video:
-                if duration == 0:
-                    duration = await get_video_duration(download_path)
-                
-                await status_msg.edit_text("**⚙️ Processing metadata and watermark...**\n\nThis may take a moment...")
-
-                font_path = "helper/ZURAMBI.ttf"
-                if not os.path.exists(font_path):
-                    font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
-                
-                if not os.path.exists(font_path):
-                    font_path = "Arial"
-                
-                watermark_text = "ANIME ATLAS"
-                drawtext_filter = (
-                    f"drawtext=text='{watermark_text}':"
-                    f"fontfile={font_path}:"
-                    f"fontsize=14:"
-                    f"fontcolor=white:"
-                    f"x=3:"
-                    f"y=3"
+
+        profile = choose_profile(backlog_depth(), job.height, job.duration)
+        video_args = [
+            '-vf', video_filter,
+            *profile_args(profile),
+        ]
+        mux_args = [
+            '-movflags', '+faststart',
+            '-max_muxing_queue_size', '9999',
+            *METADATA_ARGS,
+            *STREAM_METADATA_ARGS,
+        ]
+
+        async with TRANSCODE_GOVERNOR.lease() as lease:
+            ok = False
+            if Config.SEGMENT_ENCODING and job.duration >= Config.SEGMENT_MIN_DURATION:
+                workers = max(1, min(Config.SEGMENT_WORKERS, lease.threads))
+                threads = str(max(1, lease.max_threads // workers))
+                ok = await segmented_encode(
+                    download_path, output_path, job.duration,
+                    [*video_args, '-threads', threads],
+                    [*plan.codec_args, *mux_args], workers,
+                    on_progress=ffmpeg_progress(status_msg, job.duration, "Processing (parallel)"),
+                    map_args=plan.map_args(1),
+                    timeout=Config.FFMPEG_TIMEOUT,
+                    lease=lease,
+                    input_args=['-threads', threads, '-filter_threads', threads],
                 )
 
+            if not ok:
+                # Before -i the budget also holds the decoder and the filter graph
                 cmd = [
-                    'ffmpeg', '-i', download_path,
-                    '-vf', drawtext_filter,
-                    '-c:v', 'libx264',
-                    '-preset', 'veryfast',
-                    '-crf', '23',
-                    '-c:a', 'copy',
-                    '-c:s', 'copy',
-                    '-map', '0',
-                    '-movflags', '+faststart',
-                    '-max_muxing_queue_size', '9999',
-                    '-metadata', 'title=Join Anime Atlas on Telegram For More Anime',
-                    '-metadata', 'artist=Anime Atlas',
-                    '-metadata', 'author=Anime Atlas',
-                    '-metadata:s:v', 'title=Join Anime Atlas',
-                    '-metadata:s:a', 'title=Anime Atlas',
-                    '-y', '-progress', 'pipe:2', output_path
+                    '-threads', str(lease.max_threads),
+                    '-filter_threads', str(lease.max_threads),
+                    '-i', 'pipe:0' if job.streaming else download_path,
+                    *video_args,
+                    '-threads', str(lease.max_threads),
+                    *plan.codec_args,
+                    *plan.map_args(),
+                    *mux_args,
+                    '-y', output_path
                 ]
 
-                process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
+                runner = FFmpegRunner(
+                    cmd,
+                    on_progress=ffmpeg_progress(status_msg, job.duration, "Processing"),
+                    timeout=Config.FFMPEG_TIMEOUT,
+                    stdin=job.streaming,
+                    lease=lease,
                 )
+                await runner.start()
 
-                if duration > 0:
-                    asyncio.create_task(
-                        monitor_ffmpeg_progress(process, status_msg, duration, "Processing")
-                    )
-                
-                await process.wait()
-                
-                if process.returncode != 0 or not os.path.exists(output_path):
-                    return await status_msg.edit_text(
-                        "**❌ Video Processing Failed**\n\n"
-                        "FFmpeg error occurred. Please contact support."
+                if job.streaming:
+                    streamed, _ = await asyncio.gather(
+                        feed_ffmpeg(job, runner.process, head, chunks), runner.wait(), return_exceptions=True
                     )
+                    # A short read means the download broke off and the output is truncated
+                    ok = runner.ok and streamed == job.file_size
+                else:
+                    await runner.wait()
+                    ok = runner.ok
 
-                final_file_size = os.path.getsize(output_path)
-                
-            else:
-                await status_msg.edit_text("**⚙️ Processing metadata...**\n\nAlmost done...")
-                
-                cmd = [
-                    'ffmpeg', '-i', download_path,
-                    '-c', 'copy',
-                    '-map', '0',
-                    '-metadata', 'title=Join Anime Atlas on Telegram For More Anime',
-                    '-metadata', 'artist=Anime Atlas',
-                    '-metadata', 'author=Anime Atlas',
-                    '-y', output_path
-                ]
-                
-                process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                
-                await process.wait()
-                
-                if process.returncode != 0 or not os.path.exists(output_path):
-                    output_path = download_path
-                
-                final_file_size = os.path.getsize(output_path)
-
-            if final_file_size > 2000 * 1024 * 1024:
-                return await status_msg.edit_text(
-                    "**❌ File Too Large**\n\n"
-                    "The processed file exceeds Telegram's 2GB limit.\n"
-                    "Please try with a smaller file."
-                )
+                if not runner.ok:
+                    logger.error(f"FFmpeg failed for {job.file_name}: {runner.error_text()}")
 
-            # Get caption and thumbnail
-            c_caption = await ZoroBhaiya.get_caption(message.chat.id)
-            c_thumb = await ZoroBhaiya.get_thumbnail(message.chat.id)
+        if not ok and job.streaming:
+            # Fall back to downloading the whole file first
+            job.streaming = False
+            await status_msg.edit_text("**📥 Streaming failed - downloading the full file...**")
+            return "download"
 
-            caption = (
-                c_caption.format(
-                    filename=renamed_file_name,
-                    filesize=humanbytes(final_file_size),
-                    duration=convert(int(duration)),
-                )
-                if c_caption
-                else f"**📁 {renamed_file_name}**\n\n📦 Size: {humanbytes(final_file_size)}"
+        if not ok or not os.path.exists(output_path):
+            await status_msg.edit_text(
+                "**❌ Video Processing Failed**\n\n"
+                "FFmpeg error occurred. Please contact support."
             )
+            return None
 
-            # Prepare thumbnail
-            if c_thumb:
-                try:
-                    thumb_path = await client.download_media(c_thumb)
-                    if thumb_path:
-                        img = Image.open(thumb_path).convert("RGB")
-                        img = img.resize((320, 320))
-                        img.save(thumb_path, "JPEG")
-                except Exception:
-                    thumb_path = None
-            elif is_video and message.video and message.video.thumbs:
-                try:
-                    thumb_path = await client.download_media(message.video.thumbs[0].file_id)
-                except Exception:
-                    thumb_path = None
-
-            # STEP 3: UPLOAD
-            await status_msg.edit_text("**📤 Uploading to Telegram...**\n\nFinalizing...")
-            
-            try:
-                upload_start = time.time()
-                
-                if media_type == "document":
-                    await client.send_document(
-                        message.chat.id,
-                        document=output_path,
-                        thumb=thumb_path,
-                        caption=caption,
-                        file_name=renamed_file_name,
-                        force_document=True,
-                        progress=progress_for_pyrogram,
-                        progress_args=("**📤 Uploading...**", status_msg, upload_start),
-                    )
-                elif media_type == "video":
-                    await client.send_video(
-                        message.chat.id,
-                        video=output_path,
-                        caption=caption,
-                        thumb=thumb_path,
-                        file_name=renamed_file_name,
-                        duration=int(duration),
-                        supports_streaming=True,
-                        progress=progress_for_pyrogram,
-                        progress_args=("**📤 Uploading...**", status_msg, upload_start),
-                    )
-                elif media_type == "audio":
-                    await client.send_audio(
-                        message.chat.id,
-                        audio=output_path,
-                        caption=caption,
-                        thumb=thumb_path,
-                        file_name=renamed_file_name,
-                        duration=int(duration),
-                        progress=progress_for_pyrogram,
-                        progress_args=("**📤 Uploading...**", status_msg, upload_start),
-                    )
-                
-                try:
-                    await status_msg.delete()
-                except:
-                    pass
-                
-            except Exception as e:
-                error_msg = str(e)
-                if len(error_msg) > 150:
-                    error_msg = error_msg[:150] + "..."
-                await status_msg.edit_text(
-                    f"**❌ Upload Failed**\n\n"
-                    f"Error: {error_msg}\n\n"
-                    f"Please try again or contact support."
-                )
+    elif remux_only:
+        await status_msg.edit_text("**⚡ Already processed - updating metadata only...**")
 
-        except Exception as e:
-            if status_msg:
-                try:
-                    error_msg = str(e)
-                    if len(error_msg) > 150:
-                        error_msg = error_msg[:150] + "..."
-                    await status_msg.edit_text(
-                        f"**❌ An Error Occurred**\n\n"
-                        f"Error: {error_msg}\n\n"
-                        f"Please try again or contact @Sanji_Fr"
-                    )
-                except:
-                    pass
-
-        finally:
-            if file_id in renaming_operations:
-                del renaming_operations[file_id]
-            
-            for path in [download_path, output_path, thumb_path]:
-                if path and os.path.exists(path):
-                    try:
-                        os.remove(path)
-                    except:
-                        pass
+        runner = await run_ffmpeg([
+            '-i', download_path,
+            '-c', 'copy',
+            *plan.map_args(),
+            '-movflags', '+faststart',
+            *METADATA_ARGS,
+            *STREAM_METADATA_ARGS,
+            '-y', output_path
+        ], timeout=Config.FFMPEG_TIMEOUT)
+
+        if not runner.ok or not os.path.exists(output_path):
+            job.output_path = download_path
+
+    elif route == "rename":
+        # Nothing for ffmpeg to do - the file is uploaded under its new name
+        job.output_path = download_path
+
+    else:
+        await status_msg.edit_text("**⚙️ Processing metadata...**\n\nAlmost done...")
+
+        runner = await run_ffmpeg([
+            '-i', download_path,
+            '-c', 'copy',
+            '-map', '0',
+            *METADATA_ARGS,
+            '-y', output_path
+        ], timeout=Config.FFMPEG_TIMEOUT)
+
+        if not runner.ok or not os.path.exists(output_path):
+            job.output_path = download_path
+
+    # The source is no longer needed once the output exists
+    if job.output_path != download_path:
+        try:
+            os.remove(download_path)
+        except:
+            pass
+
+    job.final_file_size = os.path.getsize(job.output_path)
+
+    if job.final_file_size > 2000 * 1024 * 1024:
+        await status_msg.edit_text(
+            "**❌ File Too Large**\n\n"
+            "The processed file exceeds Telegram's 2GB limit.\n"
+            "Please try with a smaller file."
+        )
+        return None
+
+    await journal(job, "processed")
+
+    upload = PIPELINE.stages["upload"]
+    if upload.busy >= upload.workers:
+        await status_msg.edit_text("**📤 Processed - Waiting For Upload Slot...**")
+    return "upload"
+
+async def remember_output(job, sent):
+    """Store the uploaded file_id so identical requests can skip the pipeline"""
+    media = sent and (sent.document or sent.video or sent.audio)
+    if not media:
+        return
+    job.output_file_id = media.file_id
+    if not Config.OUTPUT_CACHE or not job.cache_key:
+        return
+    try:
+        await ZoroBhaiya.set_cached_output(job.cache_key, {
+            "file_id": media.file_id,
+            "media_type": job.media_type,
+            "file_size": job.final_file_size,
+            "duration": job.duration,
+            "file_name": job.renamed_file_name,
+            "width": job.width,
+            "height": job.height,
+            "video_codec": job.video_codec,
+            "audio_languages": job.audio_languages,
+            "created_at": time.time(),
+        })
+    except Exception as e:
+        logger.error(f"Output cache error: {e}")
+
+async def upload_stage(job):
+    """STEP 3: Caption, thumbnail and upload"""
+    client = job.client
+    message = job.message
+    status_msg = job.status_msg
+    renamed_file_name = job.renamed_file_name
+    duration = job.duration
+
+    # Get caption and thumbnail
+    c_caption = await ZoroBhaiya.get_caption(message.chat.id)
+    c_thumb = await ZoroBhaiya.get_thumbnail(message.chat.id)
+
+    caption = build_caption(job, c_caption)
+
+    # Prepare thumbnail
+    if c_thumb:
+        try:
+            job.thumb_path = await client.download_media(c_thumb)
+            if job.thumb_path:
+                img = Image.open(job.thumb_path).convert("RGB")
+                img = img.resize((320, 320))
+                img.save(job.thumb_path, "JPEG")
+        except Exception:
+            job.thumb_path = None
+    elif job.is_video and message.video and message.video.thumbs:
+        try:
+            job.thumb_path = await client.download_media(message.video.thumbs[0].file_id)
+        except Exception:
+            job.thumb_path = None
+
+    thumb_path = job.thumb_path
+    output_path = job.output_path
+
+    # STEP 3: UPLOAD
+    await status_msg.edit_text("**📤 Uploading to Telegram...**\n\nFinalizing...")
+
+    try:
+        upload_start = time.time()
+        sent = None
+
+        if job.media_type == "document":
+            sent = await client.send_document(
+                message.chat.id,
+                document=output_path,
+                thumb=thumb_path,
+                caption=caption,
+                file_name=renamed_file_name,
+                force_document=True,
+                progress=progress_for_pyrogram,
+                progress_args=("**📤 Uploading...**", status_msg, upload_start),
+            )
+        elif job.media_type == "video":
+            sent = await client.send_video(
+                message.chat.id,
+                video=output_path,
+                caption=caption,
+                thumb=thumb_path,
+                file_name=renamed_file_name,
+                duration=int(duration),
+                width=job.width,
+                height=job.height,
+                supports_streaming=True,
+                progress=progress_for_pyrogram,
+                progress_args=("**📤 Uploading...**", status_msg, upload_start),
+            )
+        elif job.media_type == "audio":
+            sent = await client.send_audio(
+                message.chat.id,
+                audio=output_path,
+                caption=caption,
+                thumb=thumb_path,
+                file_name=renamed_file_name,
+                duration=int(duration),
+                progress=progress_for_pyrogram,
+                progress_args=("**📤 Uploading...**", status_msg, upload_start),
+            )
+
+        await remember_output(job, sent)
+
+        try:
+            await status_msg.delete()
+        except:
+            pass
+
+    except Exception as e:
+        error_msg = str(e)
+        if len(error_msg) > 150:
+            error_msg = error_msg[:150] + "..."
+        await status_msg.edit_text(
+            f"**❌ Upload Failed**\n\n"
+            f"Error: {error_msg}\n\n"
+            f"Please try again or contact support."
+        )
+    return None
+
+PIPELINE = Pipeline()
+PIPELINE.add_stage("download", download_stage, Config.DOWNLOAD_WORKERS)
+PIPELINE.add_stage("process", process_stage, Config.TRANSCODE_WORKERS, maxsize=Config.PREFETCH_JOBS)
+PIPELINE.add_stage("upload", upload_stage, Config.UPLOAD_WORKERS)
+
+async def resume_jobs(client):
+    """Re-queue journaled jobs after a restart, skipping stages that already finished"""
+    try:
+        pending = await ZoroBhaiya.get_pending_jobs()
+        entries = [entry async for entry in pending]
+    except Exception as e:
+        logger.error(f"Job journal error: {e}")
+        return
+
+    for entry in entries:
+        try:
+            message = await client.get_messages(entry["chat_id"], entry["message_id"])
+        except Exception:
+            message = None
+
+        if not message or message.empty or not (message.document or message.video or message.audio):
+            await ZoroBhaiya.delete_job(entry["_id"])
+            continue
+
+        job = RenameJob(client, message)
+        job.job_id = entry["_id"]
+        stage = entry.get("stage")
+        if stage == "processed" and entry.get("output_path") and os.path.exists(entry["output_path"]):
+            job.resume_stage = "upload"
+        elif stage == "downloaded" and entry.get("download_path") and os.path.exists(entry["download_path"]):
+            job.resume_stage = "process"
+
+        if job.resume_stage:
+            job.restore(entry)
+            renaming_operations[job.cache_key] = job
+
+        try:
+            job.status_msg = await open_status(
+                job, "**♻️ Bot Restarted - Resuming Your File...**\n\nIt has been put back in the queue."
+            )
+        except Exception:
+            pass
+
+        active_jobs[job.job_id] = job
+        try:
+            await JOB_QUEUE.submit(job)
+        except QueueFull:
+            active_jobs.pop(job.job_id, None)
+            await ZoroBhaiya.delete_job(job.job_id)
+            if job.cache_key and renaming_operations.get(job.cache_key) is job:
+                del renaming_operations[job.cache_key]
+            await queue_full_status(job)
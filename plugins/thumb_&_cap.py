@@ -1,5 +1,6 @@
 from pyrogram import Client, filters
 from helper.database import ZoroBhaiya
+from helper.template import compile_template, placeholder_help, TemplateError, CAPTION
 
 @Client.on_message(filters.private & filters.command("set_caption"))
 async def add_caption(client, message):
@@ -8,13 +9,20 @@ async def add_caption(client, message):
             "**📝 Set Custom Caption**\n\n"
             "**Usage:** `/set_caption [your caption]`\n\n"
             "**Available Variables:**\n"
-            "• `{filename}` - File name\n"
-            "• `{filesize}` - File size\n"
-            "• `{duration}` - Video duration\n\n"
+            f"{placeholder_help(CAPTION)}\n\n"
             "**Example:**\n"
             "`/set_caption 📕 Name: {filename}\n📗 Size: {filesize}\n⏰ Duration: {duration}`"
         )
     caption = message.text.split(" ", 1)[1]
+    try:
+        compile_template(CAPTION, caption, strict=True)
+    except TemplateError as e:
+        return await message.reply_text(
+            "**❌ Invalid Caption!**\n\n"
+            f"{e}\n\n"
+            "**Available Variables:**\n"
+            f"{placeholder_help(CAPTION)}"
+        )
     await ZoroBhaiya.set_caption(message.from_user.id, caption=caption)
     await message.reply_text(
         "**✅ Caption Saved Successfully!**\n\n"
@@ -45,9 +53,7 @@ async def see_caption(client, message):
             f"**📝 Your Current Caption:**\n\n"
             f"`{caption}`\n\n"
             f"**Available Variables:**\n"
-            f"• `{{filename}}` - File name\n"
-            f"• `{{filesize}}` - File size\n"
-            f"• `{{duration}}` - Video duration"
+            f"{placeholder_help(CAPTION)}"
         )
     else:
         await message.reply_text(